@@ -91,6 +91,14 @@ EVENTS_PUSH_BACKEND = "taiga.events.backends.postgresql.EventsPushBackend"
 # EVENTS_PUSH_BACKEND = "taiga.events.backends.rabbitmq.EventsPushBackend"
 # EVENTS_PUSH_BACKEND_OPTIONS = {"url": "//guest:guest@127.0.0.1/"}
 
+# Publish the events from a background thread instead of the request thread.
+# The overflow policy applies when the queue is full and can be "block",
+# "drop-oldest" or "sync" (publish in the request thread).
+EVENTS_DISPATCHER_ENABLED = False
+EVENTS_DISPATCHER_QUEUE_SIZE = 1000
+EVENTS_DISPATCHER_OVERFLOW_POLICY = "block"
+EVENTS_DISPATCHER_SHUTDOWN_TIMEOUT = 5 # seconds
+
 # Message System
 MESSAGE_STORAGE = "django.contrib.messages.storage.session.SessionStorage"
 
@@ -138,6 +146,8 @@ TEMPLATE_LOADERS = [
 MIDDLEWARE_CLASSES = [
     "taiga.base.middleware.cors.CoorsMiddleware",
     "taiga.events.middleware.SessionIDMiddleware",
+    "taiga.projects.history.middleware.ValuesResolutionMiddleware",
+    "taiga.permissions.middleware.PermissionsCacheMiddleware",
 
     # Common middlewares
     "django.middleware.common.CommonMiddleware",
@@ -350,6 +360,44 @@ FEEDBACK_EMAIL = "support@taiga.io"
 # collapsed during that interval
 CHANGE_NOTIFICATIONS_MIN_INTERVAL = 0 #seconds
 
+# Send the pending notifications as one digest email per user
+# (with all the changes notified to them) instead of one email
+# per changed object. Needs CHANGE_NOTIFICATIONS_MIN_INTERVAL > 0
+CHANGE_NOTIFICATIONS_DIGEST = False
+
+# Analize the watchers and create the pending notifications
+# of a change in a deferred task instead of in the request
+CHANGE_NOTIFICATIONS_ASYNC = False
+
+# False: history entries are created in the request
+# True: the request only freezes the changed object and a deferred
+#       task computes the diff and persists the history entry
+HISTORY_ASYNC_PERSISTENCE = False
+
+# Store the text changes of history diffs as diff_match_patch deltas
+# and compress history payloads bigger than the min size (in bytes).
+# Entries stored without the codec are always readable.
+HISTORY_STORAGE_CODEC_ENABLED = False
+HISTORY_STORAGE_CODEC_MIN_SIZE = 1024
+
+# Timeline entries are written when the transaction that generates them
+# is committed.
+# False: they are written in the same request
+# True: they are written by a deferred task
+TIMELINE_ASYNC_PUSH = False
+
+# Cache the first page of each timeline. Needs a cache backend shared
+# by all the processes (memcached, redis...), including the celery
+# workers, because the cache is invalidated through the cache itself.
+TIMELINE_FIRST_PAGE_CACHE_ENABLED = False
+TIMELINE_FIRST_PAGE_CACHE_TIMEOUT = 60 * 60 # seconds
+
+# Cache the permissions of the users over the projects between requests.
+# Needs a cache backend shared by all the processes (memcached, redis...)
+# because the cache is invalidated through the cache itself.
+PERMISSIONS_CACHE_ENABLED = False
+PERMISSIONS_CACHE_TIMEOUT = 60 * 60 # seconds
+
 
 # List of functions called for filling correctly the ProjectModulesConfig associated to a project
 # This functions should receive a Project parameter and return a dict with the desired configuration
@@ -14,8 +14,26 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.six.moves.urllib import parse as urlparse
+
 from rest_framework.templatetags.rest_framework import replace_query_param
 
+from taiga.base import exceptions as exc
+
+
+def remove_query_params(url, *keys):
+    (scheme, netloc, path, query, fragment) = urlparse.urlsplit(url)
+    query_dict = urlparse.parse_qs(query)
+    for key in keys:
+        query_dict.pop(key, None)
+    query = urlparse.urlencode(sorted(list(query_dict.items())), doseq=True)
+    return urlparse.urlunsplit((scheme, netloc, path, query, fragment))
+
 
 class ConditionalPaginationMixin(object):
     def get_paginate_by(self, *args, **kwargs):
@@ -52,3 +70,99 @@ class HeadersPaginationMixin(object):
 
     def get_pagination_serializer(self, page):
         return self.get_serializer(page.object_list, many=True)
+
+
+class CursorPaginationMixin(object):
+    """
+    Keyset pagination mixin. Instead of page numbers it uses
+    opaque `before` and `after` cursor tokens built with the
+    values of `cursor_fields` (a datetime field followed by
+    an unique field), so deep pages cost the same as the first.
+    """
+    cursor_fields = ("created_at", "id")
+    cursor_descending = False
+    cursor_before_param = "before"
+    cursor_after_param = "after"
+
+    def encode_cursor(self, obj) -> str:
+        first, second = (getattr(obj, name) for name in self.cursor_fields)
+        data = json.dumps([first.isoformat(), second])
+        return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii")
+
+    def decode_cursor(self, token:str) -> tuple:
+        try:
+            data = json.loads(base64.urlsafe_b64decode(token.encode("ascii")).decode("utf-8"))
+            first, second = parse_datetime(data[0]), data[1]
+        except (ValueError, TypeError, IndexError, KeyError):
+            first = None
+
+        if first is None:
+            raise exc.WrongArguments("Invalid pagination cursor.")
+
+        return first, second
+
+    def _filter_by_cursor(self, queryset, cursor:tuple, backwards:bool=False):
+        first_field, second_field = self.cursor_fields
+        first, second = cursor
+        lookup = "lt" if self.cursor_descending != backwards else "gt"
+        return queryset.filter(Q(**{"{}__{}".format(first_field, lookup): first}) |
+                               Q(**{first_field: first, "{}__{}".format(second_field, lookup): second}))
+
+    def _order_by_cursor(self, queryset, backwards:bool=False):
+        prefix = "-" if self.cursor_descending != backwards else ""
+        return queryset.order_by(*["{}{}".format(prefix, name) for name in self.cursor_fields])
+
+    def fetch_cursor_page(self, queryset, limit:int, *, before=None, after=None) -> list:
+        """
+        Evaluate the already filtered and ordered queryset of a
+        page. Override it to add, for example, a cache layer.
+        """
+        return list(queryset[:limit])
+
+    def paginate_queryset_by_cursor(self, queryset):
+        """
+        Paginate a queryset using cursors, returning a list of
+        objects or `None` if pagination is disabled.
+        """
+        page_size = self.get_paginate_by()
+        if page_size is None:
+            return None
+
+        before = self.request.QUERY_PARAMS.get(self.cursor_before_param, None)
+        after = self.request.QUERY_PARAMS.get(self.cursor_after_param, None)
+
+        if before is not None:
+            queryset = self._filter_by_cursor(queryset, self.decode_cursor(before), backwards=True)
+            queryset = self._order_by_cursor(queryset, backwards=True)
+        else:
+            if after is not None:
+                queryset = self._filter_by_cursor(queryset, self.decode_cursor(after))
+            queryset = self._order_by_cursor(queryset)
+
+        object_list = self.fetch_cursor_page(queryset, page_size + 1, before=before, after=after)
+        has_more = len(object_list) > page_size
+        object_list = object_list[:page_size]
+
+        if before is not None:
+            object_list.reverse()
+            has_next, has_prev = True, has_more
+        else:
+            has_next, has_prev = has_more, after is not None
+
+        self.headers["x-paginated"] = "true"
+        self.headers["x-paginated-by"] = page_size
+
+        if object_list:
+            url = self.request.build_absolute_uri()
+            url = remove_query_params(url, self.cursor_before_param, self.cursor_after_param)
+
+            if has_next:
+                cursor = self.encode_cursor(object_list[-1])
+                self.headers["X-Pagination-Next"] = replace_query_param(url, self.cursor_after_param, cursor)
+
+            if has_prev:
+                cursor = self.encode_cursor(object_list[0])
+                self.headers["X-Pagination-Prev"] = replace_query_param(url, self.cursor_before_param, cursor)
+
+        return object_list
+
@@ -28,4 +28,5 @@ class BaseAppConfig(AppConfig):
         print("Monkey patching...", file=sys.stderr)
         monkey.patch_restframework()
         monkey.patch_serializer()
+        monkey.patch_transaction_hooks()
 
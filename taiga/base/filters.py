@@ -87,6 +87,18 @@ class FilterBackend(OrderByFilterMixin):
     pass
 
 
+def _get_allowed_project_ids_subquery(user, permission, project_id=None):
+    """
+    Subquery (not evaluated) with the ids of the projects where the
+    user has a permission through their membership.
+    """
+    memberships_qs = Membership.objects.filter(user=user)
+    if project_id:
+        memberships_qs = memberships_qs.filter(project_id=project_id)
+    memberships_qs = memberships_qs.filter(Q(role__permissions__contains=[permission]) | Q(is_owner=True))
+    return memberships_qs.values("project_id")
+
+
 class PermissionBasedFilterBackend(FilterBackend):
     permission = None
 
@@ -100,18 +112,14 @@ class PermissionBasedFilterBackend(FilterBackend):
         if request.user.is_authenticated() and request.user.is_superuser:
             qs = qs
         elif request.user.is_authenticated():
-            memberships_qs = Membership.objects.filter(user=request.user)
-            if project_id:
-                memberships_qs = memberships_qs.filter(project_id=project_id)
-            memberships_qs = memberships_qs.filter(Q(role__permissions__contains=[self.permission]) | Q(is_owner=True))
-
-            projects_list = [membership.project_id for membership in memberships_qs]
-
-            qs = qs.filter(Q(project_id__in=projects_list) | Q(project__public_permissions__contains=[self.permission]))
+            # The memberships are filtered in a subquery so no join
+            # that could duplicate rows (and force a distinct) is made.
+            projects_qs = _get_allowed_project_ids_subquery(request.user, self.permission, project_id)
+            qs = qs.filter(Q(project_id__in=projects_qs) | Q(project__public_permissions__contains=[self.permission]))
         else:
             qs = qs.filter(project__anon_permissions__contains=[self.permission])
 
-        return super().filter_queryset(request, qs.distinct(), view)
+        return super().filter_queryset(request, qs, view)
 
 
 class CanViewProjectFilterBackend(PermissionBasedFilterBackend):
@@ -179,18 +187,12 @@ class CanViewProjectObjFilterBackend(FilterBackend):
         if request.user.is_authenticated() and request.user.is_superuser:
             qs = qs
         elif request.user.is_authenticated():
-            memberships_qs = Membership.objects.filter(user=request.user)
-            if project_id:
-                memberships_qs = memberships_qs.filter(project_id=project_id)
-            memberships_qs = memberships_qs.filter(Q(role__permissions__contains=['view_project']) | Q(is_owner=True))
-
-            projects_list = [membership.project_id for membership in memberships_qs]
-
-            qs = qs.filter(Q(id__in=projects_list) | Q(public_permissions__contains=["view_project"]))
+            projects_qs = _get_allowed_project_ids_subquery(request.user, "view_project", project_id)
+            qs = qs.filter(Q(id__in=projects_qs) | Q(public_permissions__contains=["view_project"]))
         else:
             qs = qs.filter(public_permissions__contains=["view_project"])
 
-        return super().filter_queryset(request, qs.distinct(), view)
+        return super().filter_queryset(request, qs, view)
 
 
 class IsProjectMemberFilterBackend(FilterBackend):
@@ -198,11 +200,12 @@ class IsProjectMemberFilterBackend(FilterBackend):
         if request.user.is_authenticated() and request.user.is_superuser:
             queryset = queryset
         elif request.user.is_authenticated():
-            queryset = queryset.filter(project__members=request.user)
+            projects_qs = Membership.objects.filter(user=request.user).values("project_id")
+            queryset = queryset.filter(project_id__in=projects_qs)
         else:
             queryset = queryset.none()
 
-        return super().filter_queryset(request, queryset.distinct(), view)
+        return super().filter_queryset(request, queryset, view)
 
 
 class TagsFilter(FilterBackend):
@@ -48,3 +48,48 @@ def patch_serializer():
 def patch_restframework():
     from rest_framework import fields
     fields.strip_multiple_choice_msg = lambda x: x
+
+
+def patch_transaction_hooks():
+    """
+    Make atomic blocks run the functions registered with
+    `taiga.base.utils.db.on_commit` when the outermost block
+    is committed, and discard them when the block (or the
+    savepoint they were registered in) is rolled back.
+    """
+    from django.db import transaction
+    from taiga.base.utils import db
+    if hasattr(transaction.Atomic, "_patched"):
+        return
+
+    original_exit = transaction.Atomic.__exit__
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        connection = transaction.get_connection(self.using)
+        outermost = not connection.savepoint_ids
+        sid = None if outermost else connection.savepoint_ids[-1]
+        rollback = exc_type is not None or connection.needs_rollback
+
+        try:
+            original_exit(self, exc_type, exc_value, traceback)
+        except Exception:
+            rollback = True
+            raise
+        finally:
+            if outermost:
+                callbacks = getattr(connection, "run_on_commit", [])
+                connection.run_on_commit = []
+                if not rollback:
+                    for _, func in callbacks:
+                        func()
+            elif sid is not None:
+                # Blocks without savepoint (sid is None) leave
+                # their callbacks to the enclosing savepoint.
+                if rollback:
+                    db.discard_savepoint_callbacks(connection, sid)
+                else:
+                    db.release_savepoint_callbacks(connection, sid)
+
+    transaction.Atomic._patched = True
+    transaction.Atomic.__exit__ = __exit__
+
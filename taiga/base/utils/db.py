@@ -32,6 +32,115 @@ def get_typename_for_model_class(model:object, for_concrete_model=True) -> str:
     return "{0}.{1}".format(model._meta.app_label, model._meta.model_name)
 
 
+def _get_savepoint_key(connection):
+    # Callbacks belong to the innermost savepoint (None is the outermost
+    # transaction). Atomic blocks without savepoint can not be rolled back
+    # on their own, so their callbacks belong to the enclosing savepoint.
+    for sid in reversed(connection.savepoint_ids):
+        if sid is not None:
+            return sid
+    return None
+
+
+def release_savepoint_callbacks(connection, sid):
+    """Move the `on_commit` callbacks of a released savepoint to the
+    enclosing savepoint (or transaction).
+
+    :param connection: Database connection.
+    :param sid: Id of the released savepoint.
+    """
+    parent = _get_savepoint_key(connection)
+
+    # Batches of the released savepoint are merged
+    # with the ones of the same function of the parent.
+    result, batches = [], {}
+    for key, func in getattr(connection, "run_on_commit", []):
+        if key == sid:
+            key = parent
+
+        if key == parent and isinstance(func, _OnCommitBatch):
+            batch = batches.get(func.func, None)
+            if batch is not None:
+                batch.items.extend(func.items)
+                continue
+            batches[func.func] = func
+
+        result.append((key, func))
+
+    connection.run_on_commit = result
+
+
+def discard_savepoint_callbacks(connection, sid):
+    """Discard the `on_commit` callbacks of a rolled back savepoint
+    (including the ones of its already released savepoints).
+
+    :param connection: Database connection.
+    :param sid: Id of the rolled back savepoint.
+    """
+    connection.run_on_commit = [(key, func)
+                                for key, func in getattr(connection, "run_on_commit", [])
+                                if key != sid]
+
+
+def on_commit(func, using=None):
+    """Call a function when the current transaction is committed.
+
+    If there is no transaction in progress the function is called immediately,
+    and if the transaction (or the savepoint where it was registered) is rolled
+    back the function is discarded.
+
+    :param func: Function without arguments to call.
+    :param using: Database alias.
+    """
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block:
+        func()
+        return
+
+    if not hasattr(connection, "run_on_commit"):
+        connection.run_on_commit = []
+    connection.run_on_commit.append((_get_savepoint_key(connection), func))
+
+
+class _OnCommitBatch:
+    def __init__(self, func):
+        self.func = func
+        self.items = []
+
+    def __call__(self):
+        self.func(self.items)
+
+
+def on_commit_batch(func, item, using=None):
+    """Collect items and call a function with all of them when the current
+    transaction is committed.
+
+    Items collected in the same transaction (including its released
+    savepoints) are passed together to a single call of `func`. If there
+    is no transaction in progress `func` is called immediately with a list
+    of one item, and the items collected in a transaction or savepoint that
+    is rolled back are discarded.
+
+    :param func: Function that receives a list of items.
+    :param item: Item to collect.
+    :param using: Database alias.
+    """
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block:
+        func([item])
+        return
+
+    key = _get_savepoint_key(connection)
+    for callback_key, callback in getattr(connection, "run_on_commit", []):
+        if callback_key == key and isinstance(callback, _OnCommitBatch) and callback.func == func:
+            callback.items.append(item)
+            return
+
+    batch = _OnCommitBatch(func)
+    batch.items.append(item)
+    on_commit(batch, using=using)
+
+
 def reload_attribute(model_instance, attr_name):
     """Fetch the stored value of a model instance attribute.
 
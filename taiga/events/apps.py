@@ -19,16 +19,25 @@ from django.apps import AppConfig
 from django.db.models import signals
 
 from . import signal_handlers as handlers
+from . import events
 
 
 def connect_events_signals():
-    signals.post_save.connect(handlers.on_save_any_model, dispatch_uid="events_change")
-    signals.post_delete.connect(handlers.on_delete_any_model, dispatch_uid="events_delete")
+    # Handlers are only connected for the watched models,
+    # so saving any other model does not run them.
+    for model in events.get_watched_models():
+        typename = model._events_content_type
+        signals.post_save.connect(handlers.on_save_any_model, sender=model,
+                                  dispatch_uid="events_change_{}".format(typename))
+        signals.post_delete.connect(handlers.on_delete_any_model, sender=model,
+                                    dispatch_uid="events_delete_{}".format(typename))
 
 
 def disconnect_events_signals():
-    signals.post_save.disconnect(dispatch_uid="events_change")
-    signals.post_delete.disconnect(dispatch_uid="events_delete")
+    for model in events.get_watched_models():
+        typename = model._events_content_type
+        signals.post_save.disconnect(sender=model, dispatch_uid="events_change_{}".format(typename))
+        signals.post_delete.disconnect(sender=model, dispatch_uid="events_delete_{}".format(typename))
 
 
 class EventsAppConfig(AppConfig):
@@ -24,6 +24,20 @@ class BaseEventsPushBackend(object, metaclass=abc.ABCMeta):
     def emit_event(self, message:str, *, routing_key:str, channel:str="events"):
         pass
 
+    def emit_events(self, events:list, *, retry:bool=False):
+        """
+        Emit a batch of events. Each event is a tuple of
+        `(message, routing_key, channel)`.
+
+        `retry` is only True from background threads that can
+        wait for the backend to recover from errors.
+
+        Backends that can send several messages at once
+        should override it.
+        """
+        for message, routing_key, channel in events:
+            self.emit_event(message, routing_key=routing_key, channel=channel)
+
 
 def load_class(path):
     """
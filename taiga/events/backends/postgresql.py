@@ -12,19 +12,89 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from django.db import transaction
+import json
+import uuid
+
 from django.db import connection
 
 from . import base
 
+# PostgreSQL rejects NOTIFY payloads of 8000 bytes or more
+# (with the default configuration).
+MAX_PAYLOAD_SIZE = 7999
+
+# Room for the chunk envelope: {"chunk": {"id": ..., "index": ..., "total": ...}, "data": "..."}
+CHUNK_ENVELOPE_SIZE = 128
+
+
+def _get_channel(routing_key:str, channel:str) -> str:
+    routing_key = routing_key.replace(".", "__")
+    return "{channel}_{routing_key}".format(channel=channel,
+                                            routing_key=routing_key)
+
+
+def _split_message(message:str, max_size:int) -> list:
+    """
+    Split a message in parts whose JSON string
+    representation fits in `max_size` bytes.
+    """
+    parts = []
+    current, current_size = [], 0
+    for char in message:
+        # Size of the character once escaped in a JSON string.
+        size = len(json.dumps(char)) - 2
+        if current and current_size + size > max_size:
+            parts.append("".join(current))
+            current, current_size = [], 0
+        current.append(char)
+        current_size += size
+
+    parts.append("".join(current))
+    return parts
+
+
+def make_payloads(message:str, *, max_payload_size:int=MAX_PAYLOAD_SIZE) -> list:
+    """
+    Get the NOTIFY payloads for a message. Messages too big for one
+    notification are split in chunks that listeners have to join:
+
+        {"chunk": {"id": <message id>, "index": <0..total-1>, "total": <n>},
+         "data": <part of the message>}
+    """
+    if len(message.encode("utf-8")) <= max_payload_size:
+        return [message]
+
+    parts = _split_message(message, max_payload_size - CHUNK_ENVELOPE_SIZE)
+    message_id = uuid.uuid4().hex
+    return [json.dumps({"chunk": {"id": message_id, "index": index, "total": len(parts)},
+                        "data": part})
+            for index, part in enumerate(parts)]
+
 
 class EventsPushBackend(base.BaseEventsPushBackend):
-    @transaction.atomic
+    def __init__(self, *, max_payload_size:int=MAX_PAYLOAD_SIZE):
+        self.max_payload_size = max_payload_size
+
     def emit_event(self, message:str, *, routing_key:str, channel:str="events"):
-        routing_key = routing_key.replace(".", "__")
-        channel = "{channel}_{routing_key}".format(channel=channel,
-                                                   routing_key=routing_key)
-        sql = "NOTIFY {channel}, %s".format(channel=channel)
+        self.emit_events([(message, routing_key, channel)])
+
+    def emit_events(self, events:list, *, retry:bool=False):
+        """
+        Send all the notifications of the events with one query. Inside a
+        transaction they are delivered by PostgreSQL when it is committed.
+        """
+        statements, params = [], []
+        for message, routing_key, channel in events:
+            channel = _get_channel(routing_key, channel)
+            for payload in make_payloads(message, max_payload_size=self.max_payload_size):
+                statements.append("NOTIFY {channel}, %s".format(channel=channel))
+                params.append(payload)
+
+        if not statements:
+            return
+
         cursor = connection.cursor()
-        cursor.execute(sql, [message])
-        cursor.close()
+        try:
+            cursor.execute("; ".join(statements), params)
+        finally:
+            cursor.close()
@@ -12,8 +12,11 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import json
 import logging
+import os
+import queue
+import threading
+import time
 
 from amqp import Connection as AmqpConnection
 from amqp.basic_message import Message as AmqpMessage
@@ -24,7 +27,7 @@ from . import base
 log = logging.getLogger("tagia.events")
 
 
-def _make_rabbitmq_connection(url):
+def _make_rabbitmq_connection(url, **kwargs):
     parse_result = urlparse(url)
 
     # Parse host & user/password
@@ -40,26 +43,148 @@ def _make_rabbitmq_connection(url):
 
     vhost = parse_result.path
     return AmqpConnection(host=host, userid=user,
-                          password=password, virtual_host=vhost)
+                          password=password, virtual_host=vhost, **kwargs)
 
 
-class EventsPushBackend(base.BaseEventsPushBackend):
-    def __init__(self, url):
-        self.url = url
+class _PooledConnection(object):
+    """
+    An AMQP connection with its channel and the
+    exchanges already declared through it.
+    """
+    def __init__(self, connection):
+        self.connection = connection
+        self.channel = connection.channel()
+        self.declared_exchanges = set()
 
-    def emit_event(self, message:str, *, routing_key:str, channel:str="events"):
-        connection = _make_rabbitmq_connection(self.url)
+    def publish(self, message:str, *, routing_key:str, exchange:str):
+        if exchange not in self.declared_exchanges:
+            self.channel.exchange_declare(exchange=exchange, type="topic", auto_delete=True)
+            self.declared_exchanges.add(exchange)
+
+        self.channel.basic_publish(AmqpMessage(message), routing_key=routing_key, exchange=exchange)
 
+    def close(self):
         try:
-            rchannel = connection.channel()
-            message = AmqpMessage(message)
+            self.connection.close()
+        except Exception:
+            log.warning("Error closing events connection", exc_info=True)
 
-            rchannel.exchange_declare(exchange=channel, type="topic", auto_delete=True)
-            rchannel.basic_publish(message, routing_key=routing_key, exchange=channel)
-            rchannel.close()
 
-        except Exception:
-            log.error("Unhandled exception", exc_info=True)
+class ConnectionPool(object):
+    """
+    Per process pool of persistent AMQP connections.
+
+    Connections are created lazily and returned to the pool
+    after use; a failed connection is discarded and replaced
+    by a new one the next time it is needed.
+    """
+    def __init__(self, connection_factory, *, size:int=4):
+        self.connection_factory = connection_factory
+        self._pool = queue.LifoQueue(maxsize=size)
 
-        finally:
+    def acquire(self) -> _PooledConnection:
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            return _PooledConnection(self.connection_factory())
+
+    def release(self, connection:_PooledConnection):
+        try:
+            self._pool.put_nowait(connection)
+        except queue.Full:
             connection.close()
+
+    def discard(self, connection:_PooledConnection):
+        connection.close()
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_connection_pool(key, connection_factory, *, size:int=4) -> ConnectionPool:
+    """
+    Get the pool of connections for a key. Pools are not shared
+    between processes, a forked process gets its own pools.
+    """
+    key = (os.getpid(),) + key
+    with _pools_lock:
+        pool = _pools.get(key, None)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(connection_factory, size=size)
+        return pool
+
+
+class EventsPushBackend(base.BaseEventsPushBackend):
+    """
+    RabbitMQ events backend.
+
+    Options (`EVENTS_PUSH_BACKEND_OPTIONS`):
+    - `url`: broker url.
+    - `pool_size`: max idle connections kept by each process.
+    - `confirm_publish`: wait for the broker to confirm each message.
+    - `max_retries`, `retry_backoff`: reconnections done (waiting
+      `retry_backoff * 2 ** attempt` seconds) before giving up when
+      publishing from the events dispatcher. In the request threads
+      only one reconnection is done, without waiting.
+    - `connection_factory`: callable that returns a new connection,
+      by default a `amqp.Connection` to `url`.
+    """
+    def __init__(self, url, *, pool_size:int=4, confirm_publish:bool=False,
+                 max_retries:int=3, retry_backoff:float=0.1, connection_factory=None):
+        self.url = url
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+        # A backend instance is created for every event so connections
+        # are kept in pools shared by all the instances with the same options.
+        pool_key = (url, confirm_publish, connection_factory)
+
+        if connection_factory is None:
+            connection_factory = lambda: _make_rabbitmq_connection(url, confirm_publish=confirm_publish)
+
+        self.pool = get_connection_pool(pool_key, connection_factory, size=pool_size)
+
+    def emit_event(self, message:str, *, routing_key:str, channel:str="events"):
+        self.emit_events([(message, routing_key, channel)])
+
+    def emit_events(self, events:list, *, retry:bool=False):
+        # Requests do not wait for the broker, they only replace a
+        # broken pooled connection and fail fast during an outage.
+        max_retries = self.max_retries if retry else min(self.max_retries, 1)
+        pending = list(events)
+        attempt = 0
+
+        while pending:
+            try:
+                connection = self.pool.acquire()
+            except Exception:
+                connection = None
+                log.warning("Error connecting to the events broker", exc_info=True)
+            else:
+                try:
+                    while pending:
+                        message, routing_key, channel = pending[0]
+                        connection.publish(message, routing_key=routing_key, exchange=channel)
+                        pending.pop(0)
+                except Exception:
+                    log.warning("Error publishing events", exc_info=True)
+                    self.pool.discard(connection)
+                else:
+                    self.pool.release(connection)
+                    return
+
+            if attempt >= max_retries:
+                log.error("Unhandled exception, %s events lost", len(pending))
+                return
+
+            if retry:
+                time.sleep(self.retry_backoff * (2 ** attempt))
+            attempt += 1
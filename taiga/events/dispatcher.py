@@ -0,0 +1,200 @@
+# Copyright (C) 2014 Andrey Antukh <niwi@niwi.be>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from . import backends
+
+log = logging.getLogger("tagia.events")
+
+BLOCK = "block"
+DROP_OLDEST = "drop-oldest"
+SYNC = "sync"
+
+_STOP = object()
+
+
+class EventsDispatcher(object):
+    """
+    Publish events from a background thread.
+
+    Events are pushed to a bounded queue drained by a worker thread that
+    publishes them in batches. When the queue is full the overflow policy
+    decides what to do: `block` waits for a free slot, `drop-oldest`
+    discards the oldest queued event and `sync` publishes the event in
+    the calling thread.
+    """
+    def __init__(self, *, queue_size:int=1000, overflow_policy:str=BLOCK,
+                 batch_size:int=100, backend_factory=backends.get_events_backend):
+        assert overflow_policy in (BLOCK, DROP_OLDEST, SYNC), "invalid overflow policy"
+
+        self.overflow_policy = overflow_policy
+        self.batch_size = batch_size
+        self.backend_factory = backend_factory
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.sent = 0
+        self.dropped = 0
+        self.errors = 0
+
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._thread = None
+        self._stopped = False
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "queued": self.queue.qsize(),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "errors": self.errors,
+        }
+
+    def _incr_stat(self, name:str, value:int=1):
+        # Stats are updated from request threads and the worker thread
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + value)
+
+    def start(self):
+        with self._lock:
+            if self._thread is None and not self._stopped:
+                self._thread = threading.Thread(target=self._run, name="events-dispatcher")
+                self._thread.daemon = True
+                self._thread.start()
+
+    def stop(self, timeout:float=None):
+        """
+        Stop the worker thread after publishing the queued events, waiting
+        at most `timeout` seconds. Events dispatched after stopping the
+        dispatcher are published in the calling thread.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+            self._stopped = True
+
+        if thread is None:
+            return
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            self.queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            log.warning("Events dispatcher stopped with %s events queued", self.queue.qsize())
+            return
+
+        thread.join(None if deadline is None else max(0, deadline - time.monotonic()))
+
+    def dispatch(self, message:str, *, routing_key:str, channel:str="events"):
+        event = (message, routing_key, channel)
+        self.start()
+
+        if self._stopped:
+            self._publish([event])
+            return
+
+        if self.overflow_policy == BLOCK:
+            self.queue.put(event)
+            return
+
+        while True:
+            try:
+                self.queue.put_nowait(event)
+                return
+            except queue.Full:
+                if self.overflow_policy == SYNC:
+                    self._publish([event])
+                    return
+
+            try:
+                dropped = self.queue.get_nowait()
+            except queue.Empty:
+                continue
+
+            self.queue.task_done()
+            if dropped is _STOP:
+                # The dispatcher is stopping, the stop mark is
+                # queued again and the event is published here.
+                self.queue.put(_STOP)
+                self._publish([event])
+                return
+
+            self._incr_stat("dropped")
+
+    def _publish(self, events:list, *, retry:bool=False):
+        try:
+            self.backend_factory().emit_events(events, retry=retry)
+            self._incr_stat("sent", len(events))
+        except Exception:
+            self._incr_stat("errors")
+            log.error("Unhandled exception publishing %s events", len(events), exc_info=True)
+
+    def _publish_from_worker(self, events:list):
+        # Backends like the PostgreSQL one use the database connection of
+        # the worker thread, that is recycled (as Django does around each
+        # request) so it recovers from database disconnections.
+        close_old_connections()
+        try:
+            self._publish(events, retry=True)
+        finally:
+            close_old_connections()
+
+    def _run(self):
+        stop = False
+        while not stop:
+            events = [self.queue.get()]
+            while len(events) < self.batch_size:
+                try:
+                    events.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if _STOP in events:
+                stop = True
+                events = [e for e in events if e is not _STOP]
+
+            if events:
+                self._publish_from_worker(events)
+
+            for _ in range(len(events) + (1 if stop else 0)):
+                self.queue.task_done()
+
+
+_dispatcher = None
+_dispatcher_pid = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher() -> EventsDispatcher:
+    """
+    Get the events dispatcher of the current process
+    (forked processes get their own one).
+    """
+    global _dispatcher, _dispatcher_pid
+
+    with _dispatcher_lock:
+        if _dispatcher is None or _dispatcher_pid != os.getpid():
+            _dispatcher = EventsDispatcher(queue_size=settings.EVENTS_DISPATCHER_QUEUE_SIZE,
+                                           overflow_policy=settings.EVENTS_DISPATCHER_OVERFLOW_POLICY)
+            _dispatcher_pid = os.getpid()
+            atexit.register(_dispatcher.stop, settings.EVENTS_DISPATCHER_SHUTDOWN_TIMEOUT)
+        return _dispatcher
@@ -15,11 +15,14 @@
 import json
 import collections
 
-from django.contrib.contenttypes.models import ContentType
+from django.apps import apps
+from django.conf import settings
 
 from taiga.base.utils import json
+from taiga.base.utils.db import get_typename_for_model_class
 from . import middleware as mw
 from . import backends
+from . import dispatcher
 
 # The complete list of content types
 # of allowed models for change events
@@ -27,17 +30,33 @@ watched_types = set([
     "userstories.userstory",
     "issues.issue",
     "tasks.task",
-    "wiki.wiki_page",
+    "wiki.wikipage",
     "milestones.milestone",
 ])
 
 
+def get_watched_models() -> list:
+    """
+    Get the model classes of the watched types, with
+    their content type string cached in the class.
+    """
+    models = []
+    for typename in sorted(watched_types):
+        model_cls = apps.get_model(*typename.split("."))
+        model_cls._events_content_type = typename
+        models.append(model_cls)
+    return models
+
+
 def _get_type_for_model(model_instance):
     """
     Get content type tuple from model instance.
     """
-    ct = ContentType.objects.get_for_model(model_instance)
-    return ".".join([ct.app_label, ct.model])
+    model_cls = model_instance.__class__
+    content_type = model_cls.__dict__.get("_events_content_type", None)
+    if content_type is None:
+        content_type = get_typename_for_model_class(model_cls)
+    return content_type
 
 
 def emit_event(data:dict, routing_key:str, *,
@@ -48,6 +67,11 @@ def emit_event(data:dict, routing_key:str, *,
     data = {"session_id": sessionid,
             "data": data}
 
+    if settings.EVENTS_DISPATCHER_ENABLED:
+        return dispatcher.get_dispatcher().dispatch(json.dumps(data),
+                                                    routing_key=routing_key,
+                                                    channel=channel)
+
     backend = backends.get_events_backend()
     return backend.emit_event(message=json.dumps(data),
                               routing_key=routing_key,
@@ -69,17 +93,8 @@ def emit_event_for_model(obj, *, type:str="change", channel:str="events",
     projectid = getattr(obj, "project_id")
     pk = getattr(obj, "pk", None)
 
-    app_name, model_name = content_type.split(".", 1)
-    routing_key = "changes.project.{0}.{1}".format(projectid, app_name)
-
-    data = {"type": type,
-            "matches": content_type,
-            "pk": pk}
-
-    return emit_event(routing_key=routing_key,
-                      channel=channel,
-                      sessionid=sessionid,
-                      data=data)
+    return _emit_event_for_pk(pk, content_type, projectid, type=type,
+                              channel=channel, sessionid=sessionid)
 
 
 def emit_event_for_ids(ids, content_type:str, projectid:int, *,
@@ -88,12 +103,18 @@ def emit_event_for_ids(ids, content_type:str, projectid:int, *,
     assert isinstance(ids, collections.Iterable)
     assert content_type, "content_type parameter is mandatory"
 
+    return _emit_event_for_pk(ids, content_type, projectid, type=type,
+                              channel=channel, sessionid=sessionid)
+
+
+def _emit_event_for_pk(pk, content_type:str, projectid:int, *,
+                       type:str, channel:str, sessionid:str):
     app_name, model_name = content_type.split(".", 1)
     routing_key = "changes.project.{0}.{1}".format(projectid, app_name)
 
     data = {"type": type,
             "matches": content_type,
-            "pk": ids}
+            "pk": pk}
 
     return emit_event(routing_key=routing_key,
                       channel=channel,
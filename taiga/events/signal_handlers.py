@@ -14,36 +14,46 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from django.db.models import signals
-from django.dispatch import receiver
+import collections
+
+from taiga.base.utils.db import on_commit_batch
 
 from . import middleware as mw
 from . import events
 
 
-def on_save_any_model(sender, instance, created, **kwargs):
-    # Ignore any object that can not have project_id
-    content_type = events._get_type_for_model(instance)
+def _emit_buffered_events(buffered_events):
+    """
+    Emit the events of a transaction merging the ones of the
+    same type, session, project and content type in one event
+    with the list of pks.
+    """
+    groups = collections.OrderedDict()
+    for sessionid, type, content_type, projectid, pk in buffered_events:
+        pks = groups.setdefault((sessionid, type, content_type, projectid), [])
+        if pk not in pks:
+            pks.append(pk)
 
-    # Ignore any other events
-    if content_type not in events.watched_types:
-        return
+    for (sessionid, type, content_type, projectid), pks in groups.items():
+        pk = pks[0] if len(pks) == 1 else pks
+        events._emit_event_for_pk(pk, content_type, projectid, type=type,
+                                  channel="events", sessionid=sessionid)
 
-    sesionid = mw.get_current_session_id()
 
-    if created:
-        events.emit_event_for_model(instance, sessionid=sesionid, type="create")
-    else:
-        events.emit_event_for_model(instance, sessionid=sesionid, type="change")
+def _buffer_event(instance, content_type:str, type:str):
+    # Events are emitted once the current transaction is committed
+    # (and discarded if it is rolled back), so the pk is taken now
+    # because deleted instances lose it.
+    sessionid = mw.get_current_session_id()
+    event = (sessionid, type, content_type, instance.project_id, instance.pk)
+    on_commit_batch(_emit_buffered_events, event)
 
 
-def on_delete_any_model(sender, instance, **kwargs):
-    # Ignore any object that can not have project_id
+def on_save_any_model(sender, instance, created, **kwargs):
     content_type = events._get_type_for_model(instance)
+    _buffer_event(instance, content_type, "create" if created else "change")
 
-    # Ignore any other changes
-    if content_type not in events.watched_types:
-        return
 
-    sesionid = mw.get_current_session_id()
-    events.emit_event_for_model(instance, sessionid=sesionid, type="delete")
+def on_delete_any_model(sender, instance, **kwargs):
+    content_type = events._get_type_for_model(instance)
+    _buffer_event(instance, content_type, "delete")
@@ -190,7 +190,7 @@ class HistoryExportSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = history_models.HistoryEntry
-        exclude = ("id", "comment_html")
+        exclude = ("id", "comment_html", "values_diff_cache", "project", "content_type")
 
 
 class HistoryExportSerializerMixin(serializers.ModelSerializer):
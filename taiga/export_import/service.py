@@ -221,6 +221,8 @@ def store_history(project, obj, history):
     serialized = serializers.HistoryExportSerializer(data=history, context={"project": project})
     if serialized.is_valid():
         serialized.object.key = make_key_from_model_object(obj)
+        serialized.object.project = project
+        serialized.object.content_type = ContentType.objects.get_for_model(obj)
         if serialized.object.diff is None:
             serialized.object.diff = []
         serialized.object._importing = True
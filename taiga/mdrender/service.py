@@ -34,6 +34,9 @@ def _serialize(domtree):
 bleach._serialize = _serialize
 ### END PATCH
 
+from collections import OrderedDict
+from html.parser import HTMLParser
+
 from django.core.cache import cache
 from django.utils.encoding import force_bytes
 
@@ -139,4 +142,38 @@ def get_diff_of_htmls(html1, html2):
     diffutil.diff_cleanupSemantic(diffs)
     return diffutil.diff_pretty_html(diffs)
 
-__all__ = ["render", "get_diff_of_htmls", "render_and_extract"]
+class _MentionsHTMLParser(HTMLParser):
+    # Mentions are rendered as links to the user profile with the
+    # "mention" class; attributes are read from the parsed tags so
+    # their order and quoting does not matter.
+    def __init__(self):
+        super().__init__()
+        self.usernames = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag != "a":
+            return
+
+        attrs = dict(attrs)
+        if "mention" not in (attrs.get("class", None) or "").split():
+            return
+
+        href = attrs.get("href", None) or ""
+        if href.startswith("/profile/"):
+            username = href[len("/profile/"):].strip("/")
+            if username:
+                self.usernames.append(username)
+
+
+def extract_mentions_from_html(html):
+    """
+    Get the usernames mentioned in a text already
+    rendered with `render` without rendering it again.
+    """
+    parser = _MentionsHTMLParser()
+    parser.feed(html or "")
+    parser.close()
+    return list(OrderedDict.fromkeys(parser.usernames))
+
+
+__all__ = ["render", "get_diff_of_htmls", "render_and_extract", "extract_mentions_from_html"]
@@ -15,18 +15,59 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache as shared_cache
+
 from taiga.projects.models import Membership, Project
 from .permissions import OWNERS_PERMISSIONS, MEMBERS_PERMISSIONS, ANON_PERMISSIONS, USER_PERMISSIONS
 
 
+_local = threading.local()
+_local.cache = None
+
+
+def activate_request_cache():
+    """
+    Start caching the memberships and permissions
+    resolved in the current thread (request).
+    """
+    _local.cache = {}
+
+
+def deactivate_request_cache():
+    _local.cache = None
+
+
+def clear_request_cache():
+    if getattr(_local, "cache", None) is not None:
+        _local.cache.clear()
+
+
+def _cached(namespace:str, user, project, fetch):
+    cache = getattr(_local, "cache", None)
+    if cache is None:
+        return fetch()
+
+    key = (namespace, user.pk, project.pk)
+    if key not in cache:
+        cache[key] = fetch()
+    return cache[key]
+
+
 def _get_user_project_membership(user, project):
     if user.is_anonymous():
         return None
 
-    try:
-        return Membership.objects.get(user=user, project=project)
-    except Membership.DoesNotExist:
-        return None
+    def _fetch():
+        try:
+            return Membership.objects.get(user=user, project=project)
+        except Membership.DoesNotExist:
+            return None
+
+    return _cached("membership", user, project, _fetch)
 
 def _get_object_project(obj):
     project = None
@@ -74,8 +115,81 @@ def _get_membership_permissions(membership):
     return []
 
 
+def _get_permissions_version_cache_key(project_id:int) -> str:
+    return "permissions:version:{0}".format(project_id)
+
+
+def _get_permissions_version(project_id:int) -> int:
+    key = _get_permissions_version_cache_key(project_id)
+    version = shared_cache.get(key)
+    if version is None:
+        # Versions start at the current time so a version key evicted
+        # from the cache never reuses the version of older entries.
+        shared_cache.add(key, int(time.time() * 1000), None)
+        version = shared_cache.get(key)
+    return version
+
+
+def invalidate_project_permissions_cache(project_id:int):
+    """
+    Invalidate the cached permissions of all the users
+    over a project (in the shared and the request cache).
+    """
+    clear_request_cache()
+
+    if not settings.PERMISSIONS_CACHE_ENABLED:
+        return
+
+    key = _get_permissions_version_cache_key(project_id)
+    try:
+        shared_cache.incr(key)
+    except ValueError:
+        shared_cache.set(key, int(time.time() * 1000), None)
+
+
+def _get_shared_cached_permissions(user, project, fetch):
+    if not settings.PERMISSIONS_CACHE_ENABLED:
+        return fetch()
+
+    key = "permissions:{0}:{1}:{2}:{3}".format(project.pk, _get_permissions_version(project.pk),
+                                               user.pk or "anon", int(user.is_superuser))
+    permissions = shared_cache.get(key)
+    if permissions is None:
+        permissions = fetch()
+        shared_cache.set(key, permissions, settings.PERMISSIONS_CACHE_TIMEOUT)
+    return permissions
+
+
 def get_user_project_permissions(user, project):
-    membership = _get_user_project_membership(user, project)
+    def _fetch():
+        membership = _get_user_project_membership(user, project)
+        return _get_user_project_permissions_with_membership(user, project, membership)
+
+    def _fetch_from_shared_cache():
+        return _get_shared_cached_permissions(user, project, _fetch)
+
+    return set(_cached("permissions", user, project, _fetch_from_shared_cache))
+
+
+def filter_users_with_perm(users, perm, obj=None) -> list:
+    """
+    Filter the users with a permission over the project of an
+    object, fetching the memberships of all of them at once.
+    """
+    project = _get_object_project(obj)
+    if not project:
+        return []
+
+    users = list(users)
+    user_ids = [user.pk for user in users if not user.is_anonymous()]
+    memberships = Membership.objects.filter(project=project, user_id__in=user_ids).select_related("role")
+    memberships = {membership.user_id: membership for membership in memberships}
+
+    return [user for user in users
+            if perm in _get_user_project_permissions_with_membership(user, project, memberships.get(user.pk))]
+
+
+def _get_user_project_permissions_with_membership(user, project, membership):
     if user.is_superuser:
         owner_permissions = list(map(lambda perm: perm[0], OWNERS_PERMISSIONS))
         members_permissions = list(map(lambda perm: perm[0], MEMBERS_PERMISSIONS))
@@ -45,3 +45,12 @@ class ProjectsAppConfig(AppConfig):
         signals.post_save.connect(handlers.project_post_save,
                                   sender=apps.get_model("projects", "Project"),
                                   dispatch_uid='project_post_save')
+
+        # On membership, role or project change, invalidate permissions cache.
+        for model in (apps.get_model("projects", "Membership"),
+                      apps.get_model("users", "Role"),
+                      apps.get_model("projects", "Project")):
+            signals.post_save.connect(handlers.invalidate_permissions_cache, sender=model,
+                                      dispatch_uid="invalidate_permissions_cache_post_save_{}".format(model.__name__))
+            signals.post_delete.connect(handlers.invalidate_permissions_cache, sender=model,
+                                        dispatch_uid="invalidate_permissions_cache_post_delete_{}".format(model.__name__))
@@ -23,13 +23,14 @@ from rest_framework import status
 
 from taiga.base.decorators import detail_route
 from taiga.base.api import ReadOnlyListViewSet
+from taiga.base.api.pagination import CursorPaginationMixin
 
 from . import permissions
 from . import serializers
 from . import services
 
 
-class HistoryViewSet(ReadOnlyListViewSet):
+class HistoryViewSet(CursorPaginationMixin, ReadOnlyListViewSet):
     serializer_class = serializers.HistoryEntrySerializer
 
     content_type = None
@@ -47,10 +48,10 @@ class HistoryViewSet(ReadOnlyListViewSet):
         return filtered_qs
 
     def response_for_queryset(self, queryset):
-        # Switch between paginated or standard style responses
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_pagination_serializer(page)
+        # Switch between cursor paginated or standard style responses
+        object_list = self.paginate_queryset_by_cursor(queryset)
+        if object_list is not None:
+            serializer = self.get_serializer(object_list, many=True)
         else:
             serializer = self.get_serializer(queryset, many=True)
 
@@ -0,0 +1,97 @@
+# Copyright (C) 2014 Andrey Antukh <niwi@niwi.be>
+# Copyright (C) 2014 Jesús Espino <jespinog@gmail.com>
+# Copyright (C) 2014 David Barragán <bameda@dbarragan.com>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Storage codec for history json payloads (snapshots, diffs
+and values).
+
+Changes of large text fields in diffs are stored as a
+diff_match_patch delta against the old text, and large
+payloads are stored zlib compressed. Encoded payloads are
+json objects with a marker key, so plain payloads (stored
+without the codec) are always readable.
+"""
+
+import base64
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+import diff_match_patch
+
+DELTA_MARKER = "__delta__"
+ZLIB_MARKER = "__zlib__"
+
+
+def _encode_text_change(value, min_size:int):
+    if not isinstance(value, (list, tuple)) or len(value) != 2:
+        return value
+
+    old, new = value
+    if not isinstance(old, str) or not isinstance(new, str):
+        return value
+    if len(old) + len(new) < min_size:
+        return value
+
+    dmp = diff_match_patch.diff_match_patch()
+    return {DELTA_MARKER: [old, dmp.diff_toDelta(dmp.diff_main(old, new))]}
+
+
+def _decode_text_change(value):
+    if not isinstance(value, dict) or DELTA_MARKER not in value:
+        return value
+
+    old, delta = value[DELTA_MARKER]
+    dmp = diff_match_patch.diff_match_patch()
+    return [old, dmp.diff_text2(dmp.diff_fromDelta(old, delta))]
+
+
+def encode(value, *, min_size:int=1024):
+    """
+    Encode a history payload for storage.
+    """
+    if not isinstance(value, dict):
+        return value
+
+    value = {k: _encode_text_change(v, min_size) for k, v in value.items()}
+
+    data = json.dumps(value, cls=DjangoJSONEncoder).encode("utf-8")
+    if len(data) < min_size:
+        return value
+
+    compressed = base64.b64encode(zlib.compress(data)).decode("ascii")
+    if len(compressed) >= len(data):
+        return value
+
+    return {ZLIB_MARKER: compressed}
+
+
+def decode(value):
+    """
+    Decode a stored history payload (encoded or not).
+    """
+    if not isinstance(value, dict):
+        return value
+
+    if ZLIB_MARKER in value:
+        data = zlib.decompress(base64.b64decode(value[ZLIB_MARKER]))
+        value = json.loads(data.decode("utf-8"))
+
+    if any(isinstance(v, dict) and DELTA_MARKER in v for v in value.values()):
+        value = {k: _decode_text_change(v) for k, v in value.items()}
+
+    return value
@@ -0,0 +1,38 @@
+# Copyright (C) 2014 Andrey Antukh <niwi@niwi.be>
+# Copyright (C) 2014 Jesús Espino <jespinog@gmail.com>
+# Copyright (C) 2014 David Barragán <bameda@dbarragan.com>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from taiga.celery import app
+
+from . import services
+
+
+@app.task(name="history.persist_pending_snapshots")
+def persist_pending_snapshots(key:str):
+    entries = services.persist_pending_snapshots(key)
+    if not entries:
+        return
+
+    model_cls = services.get_model_from_key(key)
+    obj = model_cls.objects.filter(pk=services.get_pk_from_key(key)).first()
+
+    # Objects deleted through the api persist and notify their
+    # pending snapshots in the delete request, so here are only
+    # objects deleted without history (like cascade deletions).
+    if obj is None:
+        return
+
+    from taiga.projects.notifications import services as notifications_services
+    notifications_services.send_notifications_for_pending_entries(obj, entries)
@@ -15,38 +15,23 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from functools import partial
-from django.apps import apps
-from django.contrib.contenttypes.models import ContentType
 from taiga.base.utils.iterators import as_tuple
-from taiga.base.utils.iterators import as_dict
 from taiga.mdrender.service import render as mdrender
 
+from . import resolvers
+
 import os
 
 ####################
 # Values
 ####################
 
-@as_dict
-def _get_generic_values(ids:tuple, *, typename=None, attr:str="name") -> tuple:
-    app_label, model_name = typename.split(".", 1)
-    content_type = ContentType.objects.get(app_label=app_label, model=model_name)
-    model_cls = content_type.model_class()
-
-    ids = filter(lambda x: x is not None, ids)
-    qs = model_cls.objects.filter(pk__in=ids)
-    for instance in qs:
-        yield str(instance.pk), getattr(instance, attr)
+def _get_generic_values(ids:tuple, *, typename=None, attr:str="name") -> dict:
+    return resolvers.resolve_values(typename, ids, attr=attr)
 
 
-@as_dict
 def _get_users_values(ids:set) -> dict:
-    user_model = apps.get_model("users", "User")
-    ids = filter(lambda x: x is not None, ids)
-    qs = user_model.objects.filter(pk__in=tuple(ids))
-
-    for user in qs:
-        yield str(user.pk), user.get_full_name()
+    return resolvers.resolve_users_values(ids)
 
 
 _get_us_status_values = partial(_get_generic_values, typename="projects.userstorystatus")
@@ -200,11 +185,8 @@ def milestone_freezer(milestone) -> dict:
 
 
 def userstory_freezer(us) -> dict:
-    rp_cls = apps.get_model("userstories", "RolePoints")
-    rpqsd = rp_cls.objects.filter(user_story=us)
-
     points = {}
-    for rp in rpqsd:
+    for rp in us.role_points.all():
         points[str(rp.role_id)] = rp.points_id
 
     snapshot = {
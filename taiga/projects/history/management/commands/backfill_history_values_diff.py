@@ -0,0 +1,50 @@
+# Copyright (C) 2014 Andrey Antukh <niwi@niwi.be>
+# Copyright (C) 2014 Jesús Espino <jespinog@gmail.com>
+# Copyright (C) 2014 David Barragán <bameda@dbarragan.com>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from optparse import make_option
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Precompute the values diff of history entries created without it"
+
+    option_list = BaseCommand.option_list + (
+        make_option("--batch-size",
+            action="store",
+            type="int",
+            dest="batch_size",
+            default=500,
+            help="Number of history entries processed in each batch"),
+        )
+
+    def handle(self, *args, **options):
+        HistoryEntry = apps.get_model("history", "HistoryEntry")
+
+        # Keyset pagination over history entries ids
+        last_id = ""
+        while True:
+            entries = list(HistoryEntry.objects.filter(values_diff_cache__isnull=True, id__gt=last_id)
+                                               .order_by("id")[:options["batch_size"]])
+            if not entries:
+                break
+
+            for entry in entries:
+                values_diff_cache = entry.compute_values_diff()
+                HistoryEntry.objects.filter(id=entry.id).update(values_diff_cache=values_diff_cache)
+
+            last_id = entries[-1].id
@@ -0,0 +1,69 @@
+# Copyright (C) 2014 Andrey Antukh <niwi@niwi.be>
+# Copyright (C) 2014 Jesús Espino <jespinog@gmail.com>
+# Copyright (C) 2014 David Barragán <bameda@dbarragan.com>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from datetime import timedelta
+from optparse import make_option
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from taiga.projects.history.services import compact_history_for_key
+
+
+class Command(BaseCommand):
+    help = ("Compact history entries: merge consecutive hidden entries, re-anchor "
+            "complete snapshots and optionally drop old hidden entries")
+
+    option_list = BaseCommand.option_list + (
+        make_option("--batch-size",
+            action="store",
+            type="int",
+            dest="batch_size",
+            default=500,
+            help="Number of history keys processed in each batch"),
+        make_option("--retention-days",
+            action="store",
+            type="int",
+            dest="retention_days",
+            default=None,
+            help="Drop hidden entries older than this number of days"),
+        )
+
+    def handle(self, *args, **options):
+        HistoryEntry = apps.get_model("history", "HistoryEntry")
+
+        drop_hidden_before = None
+        if options["retention_days"] is not None:
+            drop_hidden_before = timezone.now() - timedelta(days=options["retention_days"])
+
+        # Keyset pagination over history keys, each key
+        # is compacted in its own transaction.
+        last_key = ""
+        total_deleted = 0
+        while True:
+            keys = list(HistoryEntry.objects.filter(key__gt=last_key)
+                                            .order_by("key")
+                                            .values_list("key", flat=True)
+                                            .distinct()[:options["batch_size"]])
+            if not keys:
+                break
+
+            for key in keys:
+                total_deleted += compact_history_for_key(key, drop_hidden_before=drop_hidden_before)
+
+            last_key = keys[-1]
+            print("Compacted history until key {} ({} entries deleted)".format(last_key, total_deleted))
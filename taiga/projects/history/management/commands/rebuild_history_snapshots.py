@@ -0,0 +1,41 @@
+# Copyright (C) 2014 Andrey Antukh <niwi@niwi.be>
+# Copyright (C) 2014 Jesús Espino <jespinog@gmail.com>
+# Copyright (C) 2014 David Barragán <bameda@dbarragan.com>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from taiga.base.utils.iterators import iter_queryset
+from taiga.projects.history.services import rebuild_snapshot_for_key
+from taiga.projects.history.services import store_snapshot_for_key
+
+
+class Command(BaseCommand):
+    help = "Rebuild the materialized last snapshot of all history keys"
+
+    def handle(self, *args, **options):
+        HistoryEntry = apps.get_model("history", "HistoryEntry")
+        qs = (HistoryEntry.objects
+                          .filter(key__isnull=False)
+                          .order_by("key")
+                          .values_list("key", flat=True)
+                          .distinct())
+
+        for key in iter_queryset(qs, itersize=100):
+            with transaction.atomic():
+                snapshot, partials = rebuild_snapshot_for_key(key)
+                if snapshot is not None:
+                    store_snapshot_for_key(key, snapshot, partials)
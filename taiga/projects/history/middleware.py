@@ -0,0 +1,32 @@
+# Copyright (C) 2014 Andrey Antukh <niwi@niwi.be>
+# Copyright (C) 2014 Jesús Espino <jespinog@gmail.com>
+# Copyright (C) 2014 David Barragán <bameda@dbarragan.com>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from . import resolvers
+
+
+class ValuesResolutionMiddleware(object):
+    """
+    Middleware that activates a history values resolution
+    scope for each request, so all the snapshots taken
+    during the request share the resolved values.
+    """
+
+    def process_request(self, request):
+        resolvers.activate_scope()
+
+    def process_response(self, request, response):
+        resolvers.deactivate_scope()
+        return response
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+import django.utils.timezone
+import django_pgjson.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('history', '0006_historysnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingSnapshot',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('key', models.CharField(max_length=255, db_index=True)),
+                ('snapshot', django_pgjson.fields.JsonField(default=None, null=True)),
+                ('project_id', models.IntegerField(default=None, null=True)),
+                ('user', django_pgjson.fields.JsonField(default=None, blank=True, null=True)),
+                ('comment', models.TextField(blank=True)),
+                ('delete', models.BooleanField(default=False)),
+                ('notify', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+            },
+            bases=(models.Model,),
+        ),
+    ]
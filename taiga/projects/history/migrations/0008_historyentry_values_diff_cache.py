@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+import django_pgjson.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('history', '0007_pendingsnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historyentry',
+            name='values_diff_cache',
+            field=django_pgjson.fields.JsonField(default=None, null=True),
+            preserve_default=True,
+        ),
+    ]
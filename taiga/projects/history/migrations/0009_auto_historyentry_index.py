@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('history', '0008_historyentry_values_diff_cache'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='historyentry',
+            index_together=set([('key', 'created_at', 'id')]),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+import django.db.models.deletion
+
+
+BACKFILL_CONTENT_TYPE_SQL = """
+UPDATE history_historyentry
+   SET content_type_id = django_content_type.id
+  FROM django_content_type
+ WHERE split_part(history_historyentry.key, ':', 1) = django_content_type.app_label || '.' || django_content_type.model
+"""
+
+BACKFILL_PROJECT_OF_PROJECTS_SQL = """
+UPDATE history_historyentry
+   SET project_id = CAST(split_part(history_historyentry.key, ':', 2) AS integer)
+ WHERE history_historyentry.key LIKE 'projects.project:%%'
+"""
+
+BACKFILL_PROJECT_SQL = """
+UPDATE history_historyentry
+   SET project_id = {table}.project_id
+  FROM {table}
+ WHERE history_historyentry.key = '{typename}:' || {table}.id
+"""
+
+TABLES = (("userstories.userstory", "userstories_userstory"),
+          ("tasks.task", "tasks_task"),
+          ("issues.issue", "issues_issue"),
+          ("wiki.wikipage", "wiki_wikipage"),
+          ("milestones.milestone", "milestones_milestone"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0001_initial'),
+        ('projects', '0012_auto_20141210_1009'),
+        ('userstories', '0007_userstory_external_reference'),
+        ('tasks', '0003_task_external_reference'),
+        ('issues', '0002_issue_external_reference'),
+        ('wiki', '0001_initial'),
+        ('milestones', '0001_initial'),
+        ('history', '0009_auto_historyentry_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historyentry',
+            name='content_type',
+            field=models.ForeignKey(related_name='+', null=True, default=None, blank=True, to='contenttypes.ContentType'),
+            preserve_default=True,
+        ),
+        migrations.AddField(
+            model_name='historyentry',
+            name='project',
+            field=models.ForeignKey(related_name='+', null=True, default=None, blank=True, db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, to='projects.Project'),
+            preserve_default=True,
+        ),
+        migrations.AlterIndexTogether(
+            name='historyentry',
+            index_together=set([('key', 'created_at', 'id'), ('project', 'content_type')]),
+        ),
+        migrations.RunSQL(BACKFILL_CONTENT_TYPE_SQL),
+        migrations.RunSQL(BACKFILL_PROJECT_OF_PROJECTS_SQL),
+    ] + [migrations.RunSQL(BACKFILL_PROJECT_SQL.format(typename=typename, table=table))
+         for typename, table in TABLES]
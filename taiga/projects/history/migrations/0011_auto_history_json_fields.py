@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+import taiga.projects.history.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('history', '0010_historyentry_project_content_type'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='historyentry',
+            name='diff',
+            field=taiga.projects.history.models.HistoryJsonField(default=None, null=True),
+        ),
+        migrations.AlterField(
+            model_name='historyentry',
+            name='snapshot',
+            field=taiga.projects.history.models.HistoryJsonField(default=None, null=True),
+        ),
+        migrations.AlterField(
+            model_name='historyentry',
+            name='values',
+            field=taiga.projects.history.models.HistoryJsonField(default=None, null=True),
+        ),
+        migrations.AlterField(
+            model_name='historyentry',
+            name='values_diff_cache',
+            field=taiga.projects.history.models.HistoryJsonField(default=None, null=True),
+        ),
+        migrations.AlterField(
+            model_name='historysnapshot',
+            name='snapshot',
+            field=taiga.projects.history.models.HistoryJsonField(default=None, null=True),
+        ),
+    ]
@@ -16,7 +16,12 @@
 
 import warnings
 
+from django.conf import settings
+
+from .services import make_key_from_model_object
+from .services import persist_pending_snapshots
 from .services import take_snapshot
+from .services import take_snapshot_async
 
 
 class HistoryResourceMixin(object):
@@ -63,7 +68,24 @@ class HistoryResourceMixin(object):
         if sobj != obj and delete:
             delete = False
 
-        self.__last_history = take_snapshot(sobj, comment=comment, user=user, delete=delete)
+        if settings.HISTORY_ASYNC_PERSISTENCE and not delete:
+            # The history entry will be created (and notified)
+            # later by a deferred task, so there is not last
+            # history for this resource.
+            notify = not getattr(self, "_not_notify", False)
+            take_snapshot_async(sobj, comment=comment, user=user, delete=delete, notify=notify)
+            self.__last_history = None
+        else:
+            if settings.HISTORY_ASYNC_PERSISTENCE:
+                # Deleted objects can not be analized by the deferred
+                # task, so their pending snapshots are persisted (and
+                # notified) now, before the delete history entry.
+                from taiga.projects.notifications import services as notifications_services
+                entries = persist_pending_snapshots(make_key_from_model_object(sobj))
+                notifications_services.send_notifications_for_pending_entries(sobj, entries)
+
+            self.__last_history = take_snapshot(sobj, comment=comment, user=user, delete=delete)
+
         self.__object_saved = True
 
     def post_save(self, obj, created=False):
@@ -18,6 +18,7 @@ from django.utils.translation import ugettext_lazy as _
 from django.utils import timezone
 from django.db import models
 from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
 from django.utils.functional import cached_property
 from django.conf import settings
 from django_pgjson.fields import JsonField
@@ -26,6 +27,7 @@ from taiga.mdrender.service import get_diff_of_htmls
 
 from .choices import HistoryType
 from .choices import HISTORY_TYPE_CHOICES
+from . import codec
 
 from taiga.base.utils.diff import make_diff as make_diff_from_dicts
 
@@ -34,6 +36,22 @@ def _generate_uuid():
     return str(uuid.uuid1())
 
 
+class HistoryJsonField(JsonField):
+    """
+    Json field that stores its payloads using the history
+    storage codec when HISTORY_STORAGE_CODEC_ENABLED is
+    set. Payloads are always decoded on read.
+    """
+    def to_python(self, value):
+        return codec.decode(super().to_python(value))
+
+    def get_db_prep_value(self, value, *args, **kwargs):
+        if getattr(settings, "HISTORY_STORAGE_CODEC_ENABLED", False):
+            min_size = getattr(settings, "HISTORY_STORAGE_CODEC_MIN_SIZE", 1024)
+            value = codec.encode(value, min_size=min_size)
+        return super().get_db_prep_value(value, *args, **kwargs)
+
+
 class HistoryEntry(models.Model):
     """
     Domain model that represents a history
@@ -50,14 +68,26 @@ class HistoryEntry(models.Model):
     type = models.SmallIntegerField(choices=HISTORY_TYPE_CHOICES)
     key = models.CharField(max_length=255, null=True, default=None, blank=True, db_index=True)
 
+    # Denormalized project and content type of the object
+    # identified by key, used on project scoped queries.
+    project = models.ForeignKey("projects.Project", null=True, blank=True, default=None,
+                                related_name="+", db_constraint=False,
+                                on_delete=models.DO_NOTHING)
+    content_type = models.ForeignKey(ContentType, null=True, blank=True, default=None,
+                                     related_name="+")
+
     # Stores the last diff
-    diff = JsonField(null=True, default=None)
+    diff = HistoryJsonField(null=True, default=None)
 
     # Stores the last complete frozen object snapshot
-    snapshot = JsonField(null=True, default=None)
+    snapshot = HistoryJsonField(null=True, default=None)
 
     # Stores a values of all identifiers used in
-    values = JsonField(null=True, default=None)
+    values = HistoryJsonField(null=True, default=None)
+
+    # Stores the precomputed values diff (with the
+    # rendered html diffs of description and content)
+    values_diff_cache = HistoryJsonField(null=True, default=None)
 
     # Stores a comment
     comment = models.TextField(blank=True)
@@ -96,6 +126,11 @@ class HistoryEntry(models.Model):
 
     @cached_property
     def values_diff(self):
+        if self.values_diff_cache is not None:
+            return self.values_diff_cache
+        return self.compute_values_diff()
+
+    def compute_values_diff(self):
         result = {}
         users_keys = ["assigned_to", "owner"]
 
@@ -210,3 +245,42 @@ class HistoryEntry(models.Model):
 
     class Meta:
         ordering = ["created_at"]
+        index_together = [["key", "created_at", "id"],
+                          ["project", "content_type"]]
+
+
+class HistorySnapshot(models.Model):
+    """
+    Materialized current snapshot for a history key.
+
+    It is updated in the same transaction that creates
+    each history entry and avoids rebuilding the last
+    snapshot replaying all partial diffs.
+    """
+    key = models.CharField(max_length=255, unique=True)
+
+    # Stores the current complete frozen object snapshot
+    snapshot = HistoryJsonField(null=True, default=None)
+
+    # Number of partial entries created since the
+    # last complete snapshot entry.
+    partials = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(default=timezone.now)
+
+
+class PendingSnapshot(models.Model):
+    """
+    Frozen object state captured in a request and pending
+    to be diffed and persisted as history entry by a
+    deferred task (in order of creation for each key).
+    """
+    key = models.CharField(max_length=255, db_index=True)
+    snapshot = JsonField(null=True, default=None)
+    project_id = models.IntegerField(null=True, default=None)
+    user = JsonField(blank=True, default=None, null=True)
+    comment = models.TextField(blank=True)
+    delete = models.BooleanField(default=False)
+    notify = models.BooleanField(default=False)
+    created_at = models.DateTimeField(default=timezone.now)
+
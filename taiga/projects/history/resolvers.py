@@ -0,0 +1,117 @@
+# Copyright (C) 2014 Andrey Antukh <niwi@niwi.be>
+# Copyright (C) 2014 Jesús Espino <jespinog@gmail.com>
+# Copyright (C) 2014 David Barragán <bameda@dbarragan.com>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Values resolvers used by history freeze implementations.
+
+This module contains a process level registry of model classes
+and a scoped identity map of already resolved values (users,
+statuses, points, roles...) so repeated snapshots in one request
+or batch reuse the lookups instead of query the database again.
+"""
+
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+
+from django.apps import apps
+
+
+_local = threading.local()
+_local.values = None
+
+
+@lru_cache(maxsize=None)
+def get_model_class(typename:str) -> object:
+    """
+    Get model class for typename (app_label.model_name).
+    """
+    app_label, model_name = typename.split(".", 1)
+    return apps.get_model(app_label, model_name)
+
+
+def is_scope_active() -> bool:
+    return getattr(_local, "values", None) is not None
+
+
+def activate_scope():
+    """
+    Start a new values resolution scope for the
+    current thread, discarding the previous one.
+    """
+    _local.values = {}
+
+
+def deactivate_scope():
+    _local.values = None
+
+
+@contextmanager
+def values_resolution_scope():
+    """
+    Context manager that caches all resolved values while
+    the block is executing. Nested scopes reuse the outer one.
+    """
+    if is_scope_active():
+        yield
+        return
+
+    activate_scope()
+    try:
+        yield
+    finally:
+        deactivate_scope()
+
+
+def _resolve(cache_key:tuple, ids, fetch) -> dict:
+    ids = {str(x) for x in ids if x is not None}
+    if not is_scope_active():
+        return dict(fetch(ids)) if ids else {}
+
+    # Only found values are cached, objects created later in
+    # the same scope must resolve on the next lookup.
+    cached = _local.values.setdefault(cache_key, {})
+    missing = ids - set(cached)
+    if missing:
+        cached.update(fetch(missing))
+
+    return {pk: cached[pk] for pk in ids if pk in cached}
+
+
+def resolve_values(typename:str, ids, *, attr:str="name") -> dict:
+    """
+    Get a dict of `attr` values (by string pk) of model
+    instances of typename with the given ids.
+    """
+    def _fetch(ids):
+        model_cls = get_model_class(typename)
+        for pk, value in model_cls.objects.filter(pk__in=ids).values_list("pk", attr):
+            yield str(pk), value
+
+    return _resolve((typename, attr), ids, _fetch)
+
+
+def resolve_users_values(ids) -> dict:
+    """
+    Get a dict of full names (by string pk) of users
+    with the given ids.
+    """
+    def _fetch(ids):
+        user_model = get_model_class("users.user")
+        for user in user_model.objects.filter(pk__in=tuple(ids)):
+            yield str(user.pk), user.get_full_name()
+
+    return _resolve(("users.user", "full_name"), ids, _fetch)
@@ -30,4 +30,5 @@ class HistoryEntrySerializer(serializers.ModelSerializer):
 
     class Meta:
         model = models.HistoryEntry
+        exclude = ("values_diff_cache",)
 
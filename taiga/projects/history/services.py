@@ -36,13 +36,19 @@ from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.core.paginator import Paginator, InvalidPage
 from django.apps import apps
+from django.db import IntegrityError
+from django.db import connection as db_connection
 from django.db import transaction as tx
+from django.utils import timezone
 
+from taiga import deferred
 from taiga.mdrender.service import render as mdrender
 from taiga.base.utils.db import get_typename_for_model_class
+from taiga.base.utils.db import on_commit
 from taiga.base.utils.diff import make_diff as make_diff_from_dicts
 
 from .models import HistoryType
+from .resolvers import values_resolution_scope
 
 
 # Type that represents a freezed object
@@ -62,6 +68,15 @@ _not_important_fields = {
     "tasks.task": frozenset(["us_order", "taskboard_order"]),
 }
 
+# Related fields used for freeze model instances in bulk
+# (select_related fields, prefetch_related fields).
+_bulk_freeze_related = {
+    "userstories.userstory": (("project",), ("role_points", "watchers", "attachments")),
+    "tasks.task": (("project",), ("watchers", "attachments")),
+    "issues.issue": (("project",), ("watchers", "attachments")),
+    "wiki.wikipage": (("project",), ("watchers", "attachments")),
+}
+
 log = logging.getLogger("taiga.history")
 
 
@@ -222,7 +237,13 @@ def _rebuild_snapshot_from_diffs(keysnapshot, partials):
     return result
 
 
-def get_last_snapshot_for_key(key:str) -> FrozenObj:
+def rebuild_snapshot_for_key(key:str) -> tuple:
+    """
+    Rebuild the current snapshot of a key replaying all
+    partial diffs since its last complete snapshot.
+
+    Returns a tuple of (snapshot, number of partials).
+    """
     entry_model = apps.get_model("history", "HistoryEntry")
 
     # Search last snapshot
@@ -232,7 +253,7 @@ def get_last_snapshot_for_key(key:str) -> FrozenObj:
 
     keysnapshot = qs.first()
     if keysnapshot is None:
-        return None, True
+        return None, 0
 
     # Get all partial snapshots
     entries = tuple(entry_model.objects
@@ -241,12 +262,56 @@ def get_last_snapshot_for_key(key:str) -> FrozenObj:
                     .order_by("created_at"))
 
     snapshot = _rebuild_snapshot_from_diffs(keysnapshot.snapshot, entries)
-    max_partial_diffs = getattr(settings, "MAX_PARTIAL_DIFFS", 60)
+    return snapshot, len(entries)
+
 
-    if len(entries) >= max_partial_diffs:
-        return FrozenObj(keysnapshot.key, snapshot), True
+def store_snapshot_for_key(key:str, snapshot:dict, partials:int):
+    """
+    Update (or create) the materialized snapshot of a key.
+    """
+    snapshot_model = apps.get_model("history", "HistorySnapshot")
+
+    def _update():
+        return (snapshot_model.objects
+                .filter(key=key)
+                .update(snapshot=snapshot, partials=partials, updated_at=timezone.now()))
 
-    return FrozenObj(keysnapshot.key, snapshot), False
+    if _update():
+        return
+
+    # Two first writers of the same key can both update 0 rows; the
+    # loser of the create race falls back to update the winner row.
+    try:
+        with tx.atomic():
+            snapshot_model.objects.create(key=key, snapshot=snapshot, partials=partials)
+    except IntegrityError:
+        _update()
+
+
+def _get_last_snapshot_and_partials(key:str) -> tuple:
+    snapshot_model = apps.get_model("history", "HistorySnapshot")
+    materialized = snapshot_model.objects.filter(key=key).first()
+
+    # Keys without materialized snapshot (history previous to
+    # the materialized store or imported) are rebuilt from diffs.
+    if materialized is None:
+        snapshot, partials = rebuild_snapshot_for_key(key)
+    else:
+        snapshot, partials = materialized.snapshot, materialized.partials
+
+    if snapshot is None:
+        return None, 0
+
+    return FrozenObj(key, snapshot), partials
+
+
+def get_last_snapshot_for_key(key:str) -> FrozenObj:
+    fobj, partials = _get_last_snapshot_and_partials(key)
+    if fobj is None:
+        return None, True
+
+    max_partial_diffs = getattr(settings, "MAX_PARTIAL_DIFFS", 60)
+    return fobj, partials >= max_partial_diffs
 
 
 # Public api
@@ -263,31 +328,25 @@ def get_modified_fields(obj:object, last_modifications):
                                     .values_list("diff", flat=True)
                                     [0:last_modifications])
 
+    # values_list does not decode the stored payloads
+    diff_field = entry_model._meta.get_field("diff")
+
     modified_fields = []
     for history_entry in history_entries:
-        modified_fields += history_entry.keys()
+        modified_fields += diff_field.to_python(history_entry).keys()
 
     return modified_fields
 
-@tx.atomic
-def take_snapshot(obj:object, *, comment:str="", user=None, delete:bool=False):
-    """
-    Given any model instance with registred content type,
-    create new history entry of "change" type.
+def _persist_snapshot(key:str, new_fobj:FrozenObj, *, project, comment:str, user:dict,
+                      delete:bool, created_at=None):
+    typename = key.split(":", 1)[0]
 
-    This raises exception in case of object wasn't
-    previously freezed.
-    """
+    old_fobj, partials = _get_last_snapshot_and_partials(key)
 
-    key = make_key_from_model_object(obj)
-    typename = get_typename_for_model_class(obj.__class__)
-
-    new_fobj = freeze_model_instance(obj)
-    old_fobj, need_real_snapshot = get_last_snapshot_for_key(key)
+    max_partial_diffs = getattr(settings, "MAX_PARTIAL_DIFFS", 60)
+    need_real_snapshot = old_fobj is None or partials >= max_partial_diffs
 
     entry_model = apps.get_model("history", "HistoryEntry")
-    user_id = None if user is None else user.id
-    user_name = "" if user is None else user.get_full_name()
 
     # Determine history type
     if delete:
@@ -317,19 +376,346 @@ def take_snapshot(obj:object, *, comment:str="", user=None, delete:bool=False):
         is_hidden = is_hidden_snapshot(fdiff)
 
     kwargs = {
-        "user": {"pk": user_id, "name": user_name},
+        "user": user,
         "key": key,
+        "project": project,
+        "content_type": ContentType.objects.get_for_model(get_model_from_key(key)),
         "type": entry_type,
         "snapshot": fdiff.snapshot if need_real_snapshot else None,
         "diff": fdiff.diff,
         "values": fvals,
         "comment": comment,
-        "comment_html": mdrender(obj.project, comment),
+        "comment_html": mdrender(project, comment),
         "is_hidden": is_hidden,
         "is_snapshot": need_real_snapshot,
     }
 
-    return entry_model.objects.create(**kwargs)
+    if created_at is not None:
+        kwargs["created_at"] = created_at
+
+    entry = entry_model(**kwargs)
+    entry.values_diff_cache = entry.compute_values_diff()
+    entry.save()
+    store_snapshot_for_key(key, fdiff.snapshot, 0 if need_real_snapshot else partials + 1)
+    return entry
+
+
+def _make_user_data(user) -> dict:
+    user_id = None if user is None else user.id
+    user_name = "" if user is None else user.get_full_name()
+    return {"pk": user_id, "name": user_name}
+
+
+@tx.atomic
+def take_snapshot(obj:object, *, comment:str="", user=None, delete:bool=False):
+    """
+    Given any model instance with registred content type,
+    create new history entry of "change" type.
+
+    This raises exception in case of object wasn't
+    previously freezed.
+    """
+    key = make_key_from_model_object(obj)
+    new_fobj = freeze_model_instance(obj)
+
+    return _persist_snapshot(key, new_fobj, project=obj.project, comment=comment,
+                             user=_make_user_data(user), delete=delete)
+
+
+def _lock_key(key:str):
+    """
+    Serialize the pending snapshot writers and persisters of a key
+    until the end of the current transaction, so pending snapshots
+    ids of a key follow the commit order of their transactions.
+    """
+    cursor = db_connection.cursor()
+    try:
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [key])
+    finally:
+        cursor.close()
+
+
+def take_snapshot_async(obj:object, *, comment:str="", user=None, delete:bool=False,
+                        notify:bool=False):
+    """
+    Same as `take_snapshot` but only freezes the model instance.
+    The diff computation and the history entry persistence are
+    deferred to a task that processes the pending snapshots of
+    each key in order, once the current transaction is committed.
+
+    If `notify` is True, the task also sends the change
+    notifications of the new history entry.
+    """
+    new_fobj = freeze_model_instance(obj)
+    if new_fobj is None:
+        return None
+
+    _lock_key(new_fobj.key)
+
+    pending_model = apps.get_model("history", "PendingSnapshot")
+    pending = pending_model.objects.create(key=new_fobj.key,
+                                           snapshot=new_fobj.snapshot,
+                                           project_id=getattr(obj, "project_id", None),
+                                           user=_make_user_data(user),
+                                           comment=comment,
+                                           delete=delete,
+                                           notify=notify)
+
+    on_commit(partial(deferred.call_async, "history.persist_pending_snapshots", pending.key))
+    return pending
+
+
+@tx.atomic
+def persist_pending_snapshots(key:str) -> list:
+    """
+    Persist, in order, all pending snapshots of the key as
+    history entries. Concurrent calls for the same key are
+    serialized with the key lock.
+
+    Returns a list of tuples (history entry, notify flag).
+    """
+    _lock_key(key)
+
+    pending_model = apps.get_model("history", "PendingSnapshot")
+    project_model = apps.get_model("projects", "Project")
+
+    qs = pending_model.objects.select_for_update().filter(key=key).order_by("id")
+
+    result = []
+    for pending in qs:
+        project = project_model.objects.filter(pk=pending.project_id).first()
+        entry = _persist_snapshot(key, FrozenObj(key, pending.snapshot),
+                                  project=project,
+                                  comment=pending.comment,
+                                  user=pending.user,
+                                  delete=pending.delete,
+                                  created_at=pending.created_at)
+        pending.delete()
+
+        if entry is not None:
+            result.append((entry, pending.notify))
+
+    return result
+
+
+def _get_last_snapshots_for_keys(keys:list) -> dict:
+    snapshot_model = apps.get_model("history", "HistorySnapshot")
+    qs = snapshot_model.objects.filter(key__in=keys)
+
+    result = {x.key: (FrozenObj(x.key, x.snapshot), x.partials) for x in qs}
+    for key in set(keys) - set(result):
+        result[key] = _get_last_snapshot_and_partials(key)
+
+    return result
+
+
+def get_last_snapshots_for_keys(keys:list) -> dict:
+    """
+    Get the last snapshot (FrozenObj) of several keys at once,
+    the materialized ones are fetched with one query.
+    """
+    return {key: fobj for key, (fobj, partials) in _get_last_snapshots_for_keys(keys).items()}
+
+
+def _merge_diffs(diffs:list) -> dict:
+    """
+    Merge a list of diffs in one unique diff with
+    all the values of each field, only useful for
+    values resolution.
+    """
+    result = {}
+    for diff in diffs:
+        for field, values in diff.items():
+            result.setdefault(field, []).extend(values)
+    return result
+
+
+@tx.atomic
+def take_snapshots_bulk(objs, user=None):
+    """
+    Same as `take_snapshot` but for a collection of model
+    instances of the same type, without comments.
+
+    Instances are freezed from one queryset, values are
+    resolved for the whole batch and history entries are
+    created in bulk.
+    """
+    objs = list(objs)
+    if len(objs) == 0:
+        return []
+
+    model_cls = objs[0].__class__
+    typename = get_typename_for_model_class(model_cls)
+    if typename not in _freeze_impl_map:
+        raise RuntimeError("No implementation found for {}".format(typename))
+
+    select_related, prefetch_related = _bulk_freeze_related.get(typename, ((), ()))
+    qs = (model_cls.objects.filter(pk__in=[obj.pk for obj in objs])
+                           .select_related(*select_related)
+                           .prefetch_related(*prefetch_related))
+    instances = {obj.pk: obj for obj in qs}
+
+    impl_fn = _freeze_impl_map[typename]
+    keys = [make_key_from_model_object(obj) for obj in objs if obj.pk in instances]
+    last_snapshots = _get_last_snapshots_for_keys(keys)
+    max_partial_diffs = getattr(settings, "MAX_PARTIAL_DIFFS", 60)
+
+    changes = []
+    for obj in objs:
+        if obj.pk not in instances:
+            continue
+
+        key = make_key_from_model_object(obj)
+        instance = instances[obj.pk]
+        new_fobj = FrozenObj(key, impl_fn(instance))
+        old_fobj, partials = last_snapshots[key]
+
+        fdiff = make_diff(old_fobj, new_fobj)
+        if not fdiff.diff and old_fobj is not None:
+            continue
+
+        need_real_snapshot = old_fobj is None or partials >= max_partial_diffs
+        entry_type = HistoryType.change if old_fobj else HistoryType.create
+        changes.append((instance, fdiff, entry_type, need_real_snapshot, partials))
+
+    entry_model = apps.get_model("history", "HistoryEntry")
+    user_id = None if user is None else user.id
+    user_name = "" if user is None else user.get_full_name()
+    content_type = ContentType.objects.get_for_model(model_cls)
+
+    entries = []
+    with values_resolution_scope():
+        # Resolve the values of all the batch at once
+        make_diff_values(typename, FrozenDiff(None, _merge_diffs(x[1].diff for x in changes), None))
+
+        for instance, fdiff, entry_type, need_real_snapshot, partials in changes:
+            entry = entry_model(user={"pk": user_id, "name": user_name},
+                                key=fdiff.key,
+                                project_id=getattr(instance, "project_id", None),
+                                content_type=content_type,
+                                type=entry_type,
+                                snapshot=fdiff.snapshot if need_real_snapshot else None,
+                                diff=fdiff.diff,
+                                values=make_diff_values(typename, fdiff),
+                                comment="",
+                                comment_html="",
+                                is_hidden=is_hidden_snapshot(fdiff),
+                                is_snapshot=need_real_snapshot)
+            entry.values_diff_cache = entry.compute_values_diff()
+            entries.append(entry)
+
+    entry_model.objects.bulk_create(entries)
+
+    # Update materialized snapshots of all changed keys the same way
+    # as single writes, sorted by key so concurrent bulk updates of
+    # overlapping keys lock their rows in the same order.
+    for instance, fdiff, entry_type, need_real_snapshot, partials in sorted(changes, key=lambda x: x[1].key):
+        store_snapshot_for_key(fdiff.key, fdiff.snapshot, 0 if need_real_snapshot else partials + 1)
+
+    return entries
+
+
+def _merge_diffs_of_entries(first:dict, second:dict) -> dict:
+    """
+    Merge two consecutive diffs in one diff from
+    the first old values to the second new values.
+    """
+    result = {}
+    for field in set(first) | set(second):
+        old = first[field][0] if field in first else second[field][0]
+        new = second[field][1] if field in second else first[field][1]
+        if old != new:
+            result[field] = (old, new)
+    return result
+
+
+def _merge_values_of_entries(first:dict, second:dict) -> dict:
+    result = deepcopy(first or {})
+    for field, values in (second or {}).items():
+        result.setdefault(field, {}).update(values)
+    return result
+
+
+@tx.atomic
+def compact_history_for_key(key:str, *, drop_hidden_before=None) -> int:
+    """
+    Compact the history entries of a key:
+
+    - Merges consecutive hidden partial entries in one.
+    - Re-anchors complete snapshots so every chain of
+      partial entries is not longer than MAX_PARTIAL_DIFFS.
+    - If `drop_hidden_before` datetime is specified, deletes
+      hidden partial entries created before it that are not
+      needed to rebuild the last snapshot.
+
+    Returns the number of deleted entries.
+    """
+    entry_model = apps.get_model("history", "HistoryEntry")
+    entries = list(entry_model.objects.select_for_update()
+                                      .filter(key=key)
+                                      .order_by("created_at"))
+    deleted, updated = set(), set()
+
+    # Merge consecutive hidden entries
+    previous = None
+    for entry in entries:
+        mergeable = (entry.is_hidden and not entry.is_snapshot and not entry.comment
+                     and entry.type == HistoryType.change)
+
+        if mergeable and previous is not None:
+            entry.diff = _merge_diffs_of_entries(previous.diff, entry.diff)
+            entry.values = _merge_values_of_entries(previous.values, entry.values)
+            entry.values_diff_cache = entry.compute_values_diff()
+            deleted.add(previous.id)
+            updated.add(entry.id)
+
+        previous = entry if mergeable else None
+
+    deleted.update(x.id for x in entries if x.id in updated and not x.diff)
+    entries = [x for x in entries if x.id not in deleted]
+
+    # Re-anchor complete snapshots
+    max_partial_diffs = getattr(settings, "MAX_PARTIAL_DIFFS", 60)
+    snapshot, partials = None, 0
+    for entry in entries:
+        if entry.is_snapshot:
+            snapshot, partials = deepcopy(entry.snapshot), 0
+            continue
+
+        if snapshot is None:
+            continue
+
+        for field, value in entry.diff.items():
+            snapshot[field] = value[1]
+
+        if partials >= max_partial_diffs:
+            entry.is_snapshot = True
+            entry.snapshot = deepcopy(snapshot)
+            updated.add(entry.id)
+            partials = 0
+        else:
+            partials += 1
+
+    # Drop old hidden entries
+    snapshots = [x.created_at for x in entries if x.is_snapshot]
+    if drop_hidden_before is not None and snapshots:
+        limit = min(drop_hidden_before, max(snapshots))
+        deleted.update(x.id for x in entries
+                       if x.is_hidden and not x.is_snapshot and x.created_at < limit)
+
+    for entry in entries:
+        if entry.id in updated and entry.id not in deleted:
+            entry.save(update_fields=["diff", "values", "values_diff_cache",
+                                      "snapshot", "is_snapshot"])
+
+    if deleted:
+        entry_model.objects.filter(id__in=deleted).delete()
+
+    snapshot, partials = rebuild_snapshot_for_key(key)
+    if snapshot is not None:
+        store_snapshot_for_key(key, snapshot, partials)
+
+    return len(deleted)
 
 
 # High level query api
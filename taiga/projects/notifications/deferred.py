@@ -0,0 +1,37 @@
+# Copyright (C) 2014 Andrey Antukh <niwi@niwi.be>
+# Copyright (C) 2014 Jesús Espino <jespinog@gmail.com>
+# Copyright (C) 2014 David Barragán <bameda@dbarragan.com>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from django.apps import apps
+
+from taiga.celery import app
+from taiga.projects.history.services import get_model_from_key, get_pk_from_key
+
+from . import services
+
+
+@app.task(name="notifications.send_notifications_for_history")
+def send_notifications_for_history(history_id:int):
+    history_model = apps.get_model("history", "HistoryEntry")
+    history = history_model.objects.filter(pk=history_id).first()
+    if history is None:
+        return
+
+    model_cls = get_model_from_key(history.key)
+    obj = model_cls.objects.filter(pk=get_pk_from_key(history.key)).first()
+    if obj is None:
+        return
+
+    services.send_notifications_for_history(obj, history)
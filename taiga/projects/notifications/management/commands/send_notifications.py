@@ -15,15 +15,31 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
+from optparse import make_option
+
 from django.core.management.base import BaseCommand
 
-from taiga.base.utils.iterators import iter_queryset
-from taiga.projects.notifications.models import HistoryChangeNotification
-from taiga.projects.notifications.services import send_sync_notifications
+from taiga.projects.notifications.services import process_sync_notifications
+
 
 class Command(BaseCommand):
+    help = "Send the pending change notifications"
+
+    option_list = BaseCommand.option_list + (
+        make_option("--workers",
+            action="store",
+            type="int",
+            dest="workers",
+            default=1,
+            help="Number of concurrent workers sending notifications (more than one needs PostgreSQL 9.5+)"),
+        make_option("--batch-size",
+            action="store",
+            type="int",
+            dest="batch_size",
+            default=100,
+            help="Number of notifications sent by a worker through one mail connection"),
+        )
 
     def handle(self, *args, **options):
-        qs = HistoryChangeNotification.objects.all()
-        for change_notification in iter_queryset(qs, itersize=100):
-            send_sync_notifications(change_notification.pk)
+        process_sync_notifications(workers=options["workers"],
+                                   batch_size=options["batch_size"])
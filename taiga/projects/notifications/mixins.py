@@ -21,6 +21,7 @@ from django.conf import settings
 from django.db import models
 from django.utils.translation import ugettext_lazy as _
 
+from taiga.projects.history.choices import HistoryType
 from taiga.projects.notifications import services
 
 
@@ -52,17 +53,21 @@ class WatchedResourceMixin(object):
         if self._not_notify:
             return
 
+        # Deleted objects can not be notified once
+        # the request finishes, so they are notified now.
+        if settings.CHANGE_NOTIFICATIONS_ASYNC and history.type != HistoryType.delete:
+            services.send_notifications_for_history_async(history)
+            return
+
         obj = self.get_object_for_snapshot(obj)
 
         # Process that analizes the corresponding diff and
         # some text fields for extract mentions and add them
         # to watchers before obtain a complete list of
-        # notifiable users.
-        services.analize_object_for_watchers(obj, history)
-
-        # Get a complete list of notifiable users for current
-        # object and send the change notification to them.
-        services.send_notifications(obj, history=history)
+        # notifiable users. Then get a complete list of
+        # notifiable users for current object and send
+        # the change notification to them.
+        services.send_notifications_for_history(obj, history)
 
     def post_save(self, obj, created=False):
         self.send_notifications(obj)
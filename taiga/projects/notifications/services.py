@@ -14,10 +14,16 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from functools import partial
+import copy
+import threading
+from collections import OrderedDict, defaultdict
+from datetime import timedelta
+from functools import partial, lru_cache
 
 from django.apps import apps
+from django.core import mail
 from django.db import IntegrityError
+from django.db import connection as db_connection
 from django.contrib.contenttypes.models import ContentType
 from django.utils import timezone
 from django.db import transaction
@@ -25,14 +31,19 @@ from django.conf import settings
 
 from djmail import template_mail
 
+from taiga import deferred
 from taiga.base import exceptions as exc
+from taiga.base.utils.db import get_typename_for_model_class
+from taiga.base.utils.db import on_commit
 from taiga.base.utils.text import strip_lines
+from taiga.front import resolve as resolve_front_url
 from taiga.projects.notifications.choices import NotifyLevel
 from taiga.projects.history.choices import HistoryType
 from taiga.projects.history.services import (make_key_from_model_object,
                                              get_last_snapshot_for_key,
+                                             get_last_snapshots_for_keys,
                                              get_model_from_key)
-from taiga.permissions.service import user_has_perm
+from taiga.permissions.service import filter_users_with_perm
 from taiga.users.models import User
 
 from .models import HistoryChangeNotification
@@ -108,35 +119,95 @@ def analize_object_for_watchers(obj:object, history:object):
     """
     Generic implementation for analize model objects and
     extract mentions from it and add it to watchers.
+
+    Mentions are extracted from the texts of the history
+    entry (its comment and the changed description or
+    content) already rendered when it was created. Entries
+    without those texts in the diff (like the create ones)
+    use the texts of their snapshot, if they have it.
     """
     from taiga import mdrender as mdr
 
-    texts = (getattr(obj, "description", ""),
-             getattr(obj, "content", ""),
-             getattr(history, "comment", ""),)
+    diff = history.diff or {}
+    if "description_html" in diff or "content_html" in diff:
+        texts = {key: value[1] for key, value in diff.items()}
+    else:
+        texts = history.snapshot or {}
+
+    htmls = (texts.get("description_html", None),
+             texts.get("content_html", None),
+             history.comment_html,)
+
+    usernames = set()
+    for html in htmls:
+        usernames.update(mdr.extract_mentions_from_html(html))
 
-    _, data = mdr.render_and_extract(obj.get_project(), "\n".join(texts))
+    if usernames:
+        mentions = User.objects.filter(username__in=usernames)
+        obj.watchers.add(*mentions)
+
+
+def send_notifications_for_history(obj:object, history:object):
+    """
+    Add the mentioned users to the watchers of an object and
+    notify the change of a history entry.
+    """
+    analize_object_for_watchers(obj, history)
+    send_notifications(obj, history=history)
 
-    if data["mentions"]:
-        for user in data["mentions"]:
-            obj.watchers.add(user)
+
+def send_notifications_for_pending_entries(obj:object, entries:list):
+    """
+    Notify the history entries returned by the asynchronous
+    history persistence (tuples of entry and notify flag).
+    """
+    for entry, notify in entries:
+        if notify:
+            send_notifications_for_history(obj, entry)
+
+
+def send_notifications_for_history_async(history:object):
+    """
+    Like `send_notifications_for_history` but the work is done
+    by a deferred task once the current transaction is committed.
+    """
+    on_commit(partial(deferred.call_async, "notifications.send_notifications_for_history", history.id))
 
 
-def _filter_by_permissions(obj, user):
+def _get_view_perm(obj) -> str:
     UserStory = apps.get_model("userstories", "UserStory")
     Issue = apps.get_model("issues", "Issue")
     Task = apps.get_model("tasks", "Task")
     WikiPage = apps.get_model("wiki", "WikiPage")
 
     if isinstance(obj, UserStory):
-        return user_has_perm(user, "view_us", obj)
+        return "view_us"
     elif isinstance(obj, Issue):
-        return user_has_perm(user, "view_issues", obj)
+        return "view_issues"
     elif isinstance(obj, Task):
-        return user_has_perm(user, "view_tasks", obj)
+        return "view_tasks"
     elif isinstance(obj, WikiPage):
-        return user_has_perm(user, "view_wiki_pages", obj)
-    return False
+        return "view_wiki_pages"
+    return None
+
+
+def _filter_by_permissions(obj, users):
+    perm = _get_view_perm(obj)
+    if perm is None:
+        return []
+    return filter_users_with_perm(users, perm, obj)
+
+
+def _get_notify_levels(project, users) -> dict:
+    """
+    Get the notification level of each user (by id) for a project
+    with one query. Users without policy get the default level,
+    but the policy is not created.
+    """
+    model_cls = apps.get_model("notifications", "NotifyPolicy")
+    qs = model_cls.objects.filter(project=project, user__in=[user.pk for user in users])
+    levels = dict(qs.values_list("user_id", "notify_level"))
+    return {user.pk: levels.get(user.pk, NotifyLevel.notwatch) for user in users}
 
 
 def get_users_to_notify(obj, *, discard_users=None) -> list:
@@ -149,25 +220,25 @@ def get_users_to_notify(obj, *, discard_users=None) -> list:
     """
     project = obj.get_project()
 
-    def _check_level(project:object, user:object, levels:tuple) -> bool:
-        policy = get_notify_policy(project, user)
-        return policy.notify_level in [int(x) for x in levels]
+    members = list(project.members.all())
+    watchers_and_participants = set(obj.get_watchers()) | set(obj.get_participants())
+    notify_levels = _get_notify_levels(project, set(members) | watchers_and_participants)
 
-    _can_notify_hard = partial(_check_level, project,
-                               levels=[NotifyLevel.watch])
-    _can_notify_light = partial(_check_level, project,
-                                levels=[NotifyLevel.watch, NotifyLevel.notwatch])
+    def _check_level(user:object, levels:tuple) -> bool:
+        return notify_levels[user.pk] in [int(x) for x in levels]
+
+    _can_notify_hard = partial(_check_level, levels=[NotifyLevel.watch])
+    _can_notify_light = partial(_check_level, levels=[NotifyLevel.watch, NotifyLevel.notwatch])
 
     candidates = set()
-    candidates.update(filter(_can_notify_hard, project.members.all()))
-    candidates.update(filter(_can_notify_light, obj.get_watchers()))
-    candidates.update(filter(_can_notify_light, obj.get_participants()))
+    candidates.update(filter(_can_notify_hard, members))
+    candidates.update(filter(_can_notify_light, watchers_and_participants))
 
     # Remove the changer from candidates
     if discard_users:
         candidates = candidates - set(discard_users)
 
-    candidates = filter(partial(_filter_by_permissions, obj), candidates)
+    candidates = _filter_by_permissions(obj, candidates)
 
     return frozenset(candidates)
 
@@ -178,18 +249,27 @@ def _resolve_template_name(model:object, *, change_type:int) -> str:
     return the preformated template name for it.
     """
     ct = ContentType.objects.get_for_model(model)
+    tmpl = "{app_label}/{model}-{change}"
+    return tmpl.format(app_label=ct.app_label,
+                       model=ct.model,
+                       change=_get_change_type_name(change_type))
+
+
+def _get_change_type_name(change_type:int) -> str:
     # Resolve integer enum value from "change_type"
     # parameter to human readable string
     if change_type == HistoryType.create:
-        change_type = "create"
+        return "create"
     elif change_type == HistoryType.change:
-        change_type = "change"
-    else:
-        change_type = "delete"
-    tmpl = "{app_label}/{model}-{change}"
-    return tmpl.format(app_label=ct.app_label,
-                       model=ct.model,
-                       change=change_type)
+        return "change"
+    return "delete"
+
+
+@lru_cache(maxsize=None)
+def _get_template_mail_class(name:str):
+    return type("TemplateMail",
+                (template_mail.TemplateMail,),
+                {"name": name})
 
 
 def _make_template_mail(name:str):
@@ -198,13 +278,35 @@ def _make_template_mail(name:str):
     instance for specified name, and return an instance
     of it.
     """
-    cls = type("TemplateMail",
-               (template_mail.TemplateMail,),
-               {"name": name})
-
+    cls = _get_template_mail_class(name)
     return cls()
 
 
+def _make_emails(template_name:str, context:dict, users) -> list:
+    """
+    Make the emails of a template for some users. The
+    template is rendered once for each language.
+    """
+    email = _make_template_mail(template_name)
+
+    users_by_language = OrderedDict()
+    for user in users:
+        users_by_language.setdefault(user.default_language, []).append(user)
+
+    emails = []
+    for language, language_users in users_by_language.items():
+        language_context = dict(context)
+        if language:
+            language_context["lang"] = language
+
+        language_email = email.make_email_object(language_users[0].email, language_context)
+        for user in language_users:
+            user_email = copy.copy(language_email)
+            user_email.to = [user.email]
+            emails.append(user_email)
+    return emails
+
+
 @transaction.atomic
 def send_notifications(obj, *, history):
     if history.is_hidden:
@@ -232,6 +334,31 @@ def send_notifications(obj, *, history):
     if settings.CHANGE_NOTIFICATIONS_MIN_INTERVAL == 0:
         send_sync_notifications(notification.id)
 
+def _send_notification(notification, *, connection=None):
+    """
+    Send the emails of a pending notification
+    and delete it.
+    """
+    history_entries = tuple(notification.history_entries.all().order_by("created_at"))
+    obj, _ = get_last_snapshot_for_key(notification.key)
+
+    context = {"snapshot": obj.snapshot,
+               "project": notification.project,
+               "changer": notification.owner,
+               "history_entries": history_entries}
+
+    model = get_model_from_key(notification.key)
+    template_name = _resolve_template_name(model, change_type=notification.history_type)
+    emails = _make_emails(template_name, context, notification.notify_users.distinct())
+
+    if emails:
+        if connection is None:
+            connection = mail.get_connection()
+        connection.send_messages(emails)
+
+    notification.delete()
+
+
 @transaction.atomic
 def send_sync_notifications(notification_id):
     """
@@ -247,24 +374,256 @@ def send_sync_notifications(notification_id):
     if time_diff.seconds < settings.CHANGE_NOTIFICATIONS_MIN_INTERVAL:
         return
 
-    history_entries = tuple(notification.history_entries.all().order_by("created_at"))
-    obj, _ = get_last_snapshot_for_key(notification.key)
+    _send_notification(notification)
 
-    context = {"snapshot": obj.snapshot,
-               "project": notification.project,
-               "changer": notification.owner,
-               "history_entries": history_entries}
 
+def _claim_notifications(limit:int, *, skip_locked:bool=False) -> list:
+    """
+    Lock and return the ids of notifications ready to be sent. Locks are
+    held until the end of the current transaction.
+
+    With `skip_locked` the notifications locked by other workers are
+    skipped instead of waited for (it needs PostgreSQL 9.5 or newer).
+    """
+    sql = strip_lines("""
+    SELECT id
+      FROM notifications_historychangenotification
+     WHERE updated_datetime <= %s
+  ORDER BY id
+     LIMIT %s
+       FOR UPDATE{skip_locked}
+    """).format(skip_locked=" SKIP LOCKED" if skip_locked else "")
+
+    max_updated_datetime = timezone.now() - timedelta(seconds=settings.CHANGE_NOTIFICATIONS_MIN_INTERVAL)
+    cursor = db_connection.cursor()
+    try:
+        cursor.execute(sql, [max_updated_datetime, limit])
+        return [row[0] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def send_notifications_batch(batch_size:int=100, *, skip_locked:bool=False) -> int:
+    """
+    Send up to `batch_size` notifications through one mail connection.
+    Return the number of notifications sent.
+
+    Each notification is claimed, sent and deleted in its own transaction,
+    so an error sending one email does not send again the previous ones.
+    """
+    connection = None
+    sent = 0
+    try:
+        while sent < batch_size:
+            with transaction.atomic():
+                ids = _claim_notifications(1, skip_locked=skip_locked)
+                if not ids:
+                    break
+
+                notification = (HistoryChangeNotification.objects
+                                .select_related("owner", "project")
+                                .get(pk=ids[0]))
+
+                if connection is None:
+                    connection = mail.get_connection()
+                    connection.open()
+
+                _send_notification(notification, connection=connection)
+            sent += 1
+    finally:
+        if connection is not None:
+            connection.close()
+
+    return sent
+
+
+def _get_digest_change(notification, snapshot, history_entries) -> dict:
     model = get_model_from_key(notification.key)
-    template_name = _resolve_template_name(model, change_type=notification.history_type)
-    email = _make_template_mail(template_name)
+    project = notification.project
+    snapshot = snapshot or {}
+
+    typename = get_typename_for_model_class(model)
+    if typename == "wiki.wikipage":
+        title, url = snapshot.get("slug"), resolve_front_url("wiki", project.slug, snapshot.get("slug"))
+    elif typename == "projects.project":
+        title, url = snapshot.get("name"), resolve_front_url("project", project.slug)
+    elif typename == "milestones.milestone":
+        title, url = snapshot.get("name"), resolve_front_url("taskboard", project.slug, snapshot.get("slug"))
+    else:
+        url_type = {"userstories.userstory": "userstory",
+                    "tasks.task": "task",
+                    "issues.issue": "issue"}.get(typename, None)
+        title = "#{0} {1}".format(snapshot.get("ref"), snapshot.get("subject"))
+        url = resolve_front_url(url_type, project.slug, snapshot.get("ref")) if url_type else None
+
+    return {"project": project,
+            "changer": notification.owner,
+            "change_type": _get_change_type_name(notification.history_type),
+            "object": model,
+            "model_name": model._meta.verbose_name,
+            "title": title,
+            "url": url,
+            "history_entries": history_entries}
+
+
+def _claim_digest_recipient(max_updated_datetime) -> int:
+    """
+    Get and lock, until the end of the current transaction, a user
+    with notifications ready to be sent. Users locked by other
+    workers are skipped.
+    """
+    candidates = (HistoryChangeNotification.notify_users.through.objects
+                  .filter(historychangenotification__updated_datetime__lte=max_updated_datetime)
+                  .order_by("user_id")
+                  .values_list("user_id", flat=True)
+                  .distinct())
 
-    for user in notification.notify_users.distinct():
-        email.send(user.email, context)
+    cursor = db_connection.cursor()
+    try:
+        for user_id in candidates:
+            lock_key = "notifications.digest:{0}".format(user_id)
+            cursor.execute("SELECT pg_try_advisory_xact_lock(hashtext(%s))", [lock_key])
+            if cursor.fetchone()[0]:
+                return user_id
+    finally:
+        cursor.close()
 
-    notification.delete()
+    return None
+
+
+def _lock_ready_notifications(ids, max_updated_datetime) -> list:
+    """
+    Lock, until the end of the current transaction, the notifications
+    that are still ready to be sent, so new changes can not be added to
+    them while they are sent. Return their ids.
+    """
+    qs = (HistoryChangeNotification.objects.select_for_update()
+          .filter(pk__in=ids, updated_datetime__lte=max_updated_datetime)
+          .order_by("id")
+          .values_list("id", flat=True))
+    return list(qs)
+
+
+def _send_digest_notification(max_updated_datetime, *, connection) -> bool:
+    """
+    Send one digest email with all the ready notifications of a user.
+    Notifications are deleted once they are sent to all their users.
+    Return False if there are no more digests to send.
+    """
+    with transaction.atomic():
+        user_id = _claim_digest_recipient(max_updated_datetime)
+        if user_id is None:
+            return False
+
+        users_through = HistoryChangeNotification.notify_users.through
+        rows = (users_through.objects
+                .filter(user_id=user_id,
+                        historychangenotification__updated_datetime__lte=max_updated_datetime))
+        ids = _lock_ready_notifications(set(rows.values_list("historychangenotification_id", flat=True)),
+                                        max_updated_datetime)
+
+        # Sent by other worker before the user was locked, or
+        # changed again and not ready until the next window.
+        if not ids:
+            return True
+
+        notifications = (HistoryChangeNotification.objects.filter(pk__in=ids)
+                         .select_related("owner", "project")
+                         .order_by("id"))
+
+        history_entries = defaultdict(list)
+        entries_through = HistoryChangeNotification.history_entries.through
+        qs = (entries_through.objects.filter(historychangenotification_id__in=ids)
+              .select_related("historyentry")
+              .order_by("historyentry__created_at"))
+        for row in qs:
+            history_entries[row.historychangenotification_id].append(row.historyentry)
+
+        snapshots = get_last_snapshots_for_keys(list({n.key for n in notifications}))
+        changes = []
+        for notification in notifications:
+            fobj = snapshots.get(notification.key)
+            changes.append(_get_digest_change(notification, fobj.snapshot if fobj else None,
+                                              history_entries[notification.id]))
+
+        user = User.objects.get(pk=user_id)
+        context = {"changes": changes}
+        if user.default_language:
+            context["lang"] = user.default_language
+
+        email = _make_template_mail("notifications/digest")
+        connection.send_messages([email.make_email_object(user.email, context)])
+
+        rows.filter(historychangenotification_id__in=ids).delete()
+        (HistoryChangeNotification.objects
+         .filter(pk__in=ids, notify_users__isnull=True)
+         .delete())
+        return True
+
+
+def send_digest_notifications_batch(batch_size:int=100) -> int:
+    """
+    Send up to `batch_size` digest emails, each one with all the ready
+    notifications of a user, through one mail connection. Return the
+    number of digests sent.
+
+    Each digest is sent in its own transaction, locking its user (not
+    the notifications), so concurrent workers never send two digests
+    of the same notifications to a user.
+    """
+    max_updated_datetime = timezone.now() - timedelta(seconds=settings.CHANGE_NOTIFICATIONS_MIN_INTERVAL)
+
+    # Notifications without users to notify are never sent
+    (HistoryChangeNotification.objects
+     .filter(updated_datetime__lte=max_updated_datetime, notify_users__isnull=True)
+     .delete())
+
+    connection = mail.get_connection()
+    connection.open()
+    sent = 0
+    try:
+        while sent < batch_size:
+            if not _send_digest_notification(max_updated_datetime, connection=connection):
+                break
+            sent += 1
+    finally:
+        connection.close()
+
+    return sent
+
+
+def _get_batch_sender(*, skip_locked:bool=False):
+    if settings.CHANGE_NOTIFICATIONS_DIGEST:
+        return send_digest_notifications_batch
+    return partial(send_notifications_batch, skip_locked=skip_locked)
 
 
-def process_sync_notifications():
-    for notification in HistoryChangeNotification.objects.all():
-        send_sync_notifications(notification.pk)
+def _send_notifications_worker(batch_size:int):
+    send_batch = _get_batch_sender(skip_locked=True)
+    try:
+        while send_batch(batch_size):
+            pass
+    finally:
+        db_connection.close()
+
+
+def process_sync_notifications(*, workers:int=1, batch_size:int=100):
+    """
+    Send all the notifications ready to be sent (as digests if
+    CHANGE_NOTIFICATIONS_DIGEST is enabled). With more than one
+    worker, each one runs in its own thread (with its own database
+    connection) and they never claim the same notifications, which
+    needs PostgreSQL 9.5 or newer.
+    """
+    if workers <= 1:
+        send_batch = _get_batch_sender()
+        while send_batch(batch_size):
+            pass
+        return
+
+    threads = [threading.Thread(target=_send_notifications_worker, args=(batch_size,))
+               for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
@@ -18,6 +18,9 @@ from django.db.models import Q, Count
 import datetime
 import copy
 
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+
 from taiga.projects.history.models import HistoryEntry
 
 
@@ -238,13 +241,14 @@ def _get_iocaine_tasks_per_member_stats(project):
 
 def _get_wiki_changes_per_member_stats(project):
     # Wiki changes
-    wiki_changes = {}
-    wiki_page_keys = ["wiki.wikipage:%s"%id for id in project.wiki_pages.values_list("id", flat=True)]
-    history_entries = HistoryEntry.objects.filter(key__in=wiki_page_keys).values('user')
-    for entry in history_entries:
-        editions = wiki_changes.get(entry["user"]["pk"], 0)
-        wiki_changes[entry["user"]["pk"]] = editions + 1
-
+    content_type = ContentType.objects.get_for_model(apps.get_model("wiki", "WikiPage"))
+    history_entries = HistoryEntry.objects\
+        .filter(project=project, content_type=content_type)\
+        .extra(select={"user_pk": "(history_historyentry.\"user\"->>'pk')::integer"})\
+        .values("user_pk")\
+        .annotate(count=Count("id"))\
+        .order_by()
+    wiki_changes = {p["user_pk"]: p["count"] for p in history_entries}
     return wiki_changes
 
 
@@ -14,11 +14,15 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from functools import partial
+
 from django.apps import apps
 from django.conf import settings
 
 from taiga.projects.services.tags_colors import update_project_tags_colors_handler, remove_unused_tags
 from taiga.projects.notifications.services import create_notify_policy_if_not_exists
+from taiga.permissions import service as permissions_service
+from taiga.base.utils.db import on_commit
 
 
 ####################################
@@ -90,3 +94,21 @@ def project_post_save(sender, instance, created, **kwargs):
         Membership = apps.get_model("projects", "Membership")
         Membership.objects.create(user=instance.owner, project=instance, role=owner_role,
                                   is_owner=True, email=instance.owner.email)
+
+
+####################################
+# Signals for permissions cache
+####################################
+
+def invalidate_permissions_cache(sender, instance, **kwargs):
+    # Memberships, roles and projects define the permissions
+    # of the users so any change of them invalidates the cache.
+    project_id = instance.pk if isinstance(instance, apps.get_model("projects", "Project")) else instance.project_id
+    if project_id is None:
+        return
+
+    permissions_service.invalidate_project_permissions_cache(project_id)
+
+    # Invalidate it again when the transaction is committed, so permissions
+    # cached meanwhile from the previous state are not used.
+    on_commit(partial(permissions_service.invalidate_project_permissions_cache, project_id))
@@ -15,7 +15,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from taiga.base.utils import db, text
-from taiga.projects.history.services import take_snapshot
+from taiga.projects.history.services import take_snapshots_bulk
 from taiga.events import events
 
 from . import models
@@ -68,10 +68,6 @@ def update_tasks_order_in_bulk(bulk_data:list, field:str, project:object):
 
 
 def snapshot_tasks_in_bulk(bulk_data, user):
-    task_ids = []
-    for task_data in bulk_data:
-        try:
-            task = models.Task.objects.get(pk=task_data['task_id'])
-            take_snapshot(task, user=user)
-        except models.UserStory.DoesNotExist:
-            pass
+    task_ids = [task_data["task_id"] for task_data in bulk_data]
+    tasks = models.Task.objects.filter(pk__in=task_ids)
+    take_snapshots_bulk(tasks, user=user)
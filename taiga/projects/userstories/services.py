@@ -17,7 +17,7 @@
 from django.utils import timezone
 
 from taiga.base.utils import db, text
-from taiga.projects.history.services import take_snapshot
+from taiga.projects.history.services import take_snapshots_bulk
 from taiga.events import events
 
 from . import models
@@ -70,13 +70,9 @@ def update_userstories_order_in_bulk(bulk_data:list, field:str, project:object):
 
 
 def snapshot_userstories_in_bulk(bulk_data, user):
-    user_story_ids = []
-    for us_data in bulk_data:
-        try:
-            us = models.UserStory.objects.get(pk=us_data['us_id'])
-            take_snapshot(us, user=user)
-        except models.UserStory.DoesNotExist:
-            pass
+    user_story_ids = [us_data["us_id"] for us_data in bulk_data]
+    user_stories = models.UserStory.objects.filter(pk__in=user_story_ids)
+    take_snapshots_bulk(user_stories, user=user)
 
 
 def calculate_userstory_is_closed(user_story):
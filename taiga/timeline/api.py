@@ -20,6 +20,7 @@ from django.shortcuts import get_object_or_404
 from rest_framework.response import Response
 
 from taiga.base.api import GenericViewSet
+from taiga.base.api.pagination import CursorPaginationMixin
 
 from . import serializers
 from . import service
@@ -27,8 +28,10 @@ from . import permissions
 from . import models
 
 
-class TimelineViewSet(GenericViewSet):
+class TimelineViewSet(CursorPaginationMixin, GenericViewSet):
     serializer_class = serializers.TimelineSerializer
+    cursor_fields = ("created", "id")
+    cursor_descending = True
 
     content_type = None
 
@@ -44,11 +47,23 @@ class TimelineViewSet(GenericViewSet):
         filtered_qs = self.filter_queryset(qs)
         return filtered_qs
 
+    def fetch_cursor_page(self, queryset, limit, *, before=None, after=None):
+        if before is None and after is None:
+            return service.get_timeline_first_page(self.object, queryset, limit)
+        return super().fetch_cursor_page(queryset, limit, before=before, after=after)
+
     def response_for_queryset(self, queryset):
-        # Switch between paginated or standard style responses
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_pagination_serializer(page)
+        # Clients paginating by page number keep the page style responses
+        if self.page_kwarg in self.request.QUERY_PARAMS:
+            page = self.paginate_queryset(queryset)
+            if page is not None:
+                serializer = self.get_pagination_serializer(page)
+                return Response(serializer.data)
+
+        # Switch between cursor paginated or standard style responses
+        object_list = self.paginate_queryset_by_cursor(queryset)
+        if object_list is not None:
+            serializer = self.get_serializer(object_list, many=True)
         else:
             serializer = self.get_serializer(queryset, many=True)
 
@@ -60,7 +75,7 @@ class TimelineViewSet(GenericViewSet):
         return Response({})
 
     def retrieve(self, request, pk):
-        obj = self.get_object()
+        obj = self.object = self.get_object()
         self.check_permissions(request, "retrieve", obj)
 
         qs = service.get_timeline(obj)
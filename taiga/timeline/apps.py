@@ -32,8 +32,10 @@ class TimelineAppConfig(AppConfig):
                                   sender=apps.get_model("userstories", "UserStory"))
         signals.post_save.connect(handlers.create_issue_push_to_timeline,
                                   sender=apps.get_model("issues", "Issue"))
-        signals.pre_save.connect(handlers.create_membership_push_to_timeline,
-                                 sender=apps.get_model("projects", "Membership"))
+        signals.post_init.connect(handlers.store_membership_values,
+                                  sender=apps.get_model("projects", "Membership"))
+        signals.post_save.connect(handlers.create_membership_push_to_timeline,
+                                  sender=apps.get_model("projects", "Membership"))
         signals.post_delete.connect(handlers.delete_membership_push_to_timeline,
                                     sender=apps.get_model("projects", "Membership"))
 
@@ -0,0 +1,30 @@
+# Copyright (C) 2014 Andrey Antukh <niwi@niwi.be>
+# Copyright (C) 2014 Jesús Espino <jespinog@gmail.com>
+# Copyright (C) 2014 David Barragán <bameda@dbarragan.com>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from taiga.celery import app
+
+from . import service
+
+
+# Messages are acknowledged after the task has stored the events and the
+# task is retried if it fails, so every event is stored at least once.
+@app.task(name="timeline.store_timeline_events", bind=True, acks_late=True,
+          default_retry_delay=30, max_retries=10)
+def store_timeline_events(self, events:list):
+    try:
+        service.store_timeline_events(events)
+    except Exception as exc:
+        raise self.retry(exc=exc)
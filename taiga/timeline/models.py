@@ -39,7 +39,7 @@ class Timeline(models.Model):
         return super().save(*args, **kwargs)
 
     class Meta:
-        index_together = [('content_type', 'object_id', 'namespace'), ]
+        index_together = [('content_type', 'object_id', 'namespace', 'created', 'id'), ]
 
 
 # Register all implementations
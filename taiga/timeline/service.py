@@ -14,12 +14,22 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
 from django.db.models import Model
 from django.db.models.query import QuerySet
 from functools import partial, wraps
 from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
+from taiga import deferred
 from taiga.base.utils.db import get_typename_for_model_class
+from taiga.base.utils.db import on_commit_batch
+
+log = logging.getLogger("taiga.timeline")
 
 _timeline_impl_map = {}
 
@@ -42,23 +52,48 @@ def _get_class_implementation(model:Model, event_type:str):
     return _timeline_impl_map.get(key, None)
 
 
-def _add_to_object_timeline(obj:object, instance:object, event_type:str, namespace:str="default", extra_data:dict={}):
-    assert isinstance(obj, Model), "obj must be a instance of Model"
+def _get_content_type_for_model(model:Model):
+    # ContentType manager keeps a per process cache of content types so, after
+    # the first lookup, this not touches the database.
+    return ContentType.objects.get_for_model(model)
+
+
+def _build_timeline_entries(objects, instance:object, event_type:str, namespace:str="default", extra_data:dict={}):
     assert isinstance(instance, Model), "instance must be a instance of Model"
     from .models import Timeline
 
     impl = _get_class_implementation(instance.__class__, event_type)
-    Timeline.objects.create(
-        content_object=obj,
-        namespace=namespace,
-        event_type=event_type,
-        data=impl(instance, extra_data=extra_data)
-    )
+    data = impl(instance, extra_data=extra_data)
+
+    entries = []
+    for obj in objects:
+        assert isinstance(obj, Model), "obj must be a instance of Model"
+        entries.append(Timeline(content_type=_get_content_type_for_model(obj.__class__),
+                                object_id=obj.pk,
+                                namespace=namespace,
+                                event_type=event_type,
+                                data=data))
+    return entries
+
+
+def _add_to_object_timeline(obj:object, instance:object, event_type:str, namespace:str="default", extra_data:dict={}):
+    assert isinstance(obj, Model), "obj must be a instance of Model"
+    _add_to_objects_timeline([obj], instance, event_type, namespace, extra_data)
 
 
 def _add_to_objects_timeline(objects, instance:object, event_type:str, namespace:str="default", extra_data:dict={}):
-    for obj in objects:
-        _add_to_object_timeline(obj, instance, event_type, namespace, extra_data)
+    """
+    Add the same event to the timeline of several objects.
+
+    The payload is built once for the instance and all timeline
+    entries are inserted with one query.
+    """
+    from .models import Timeline
+
+    entries = _build_timeline_entries(objects, instance, event_type, namespace, extra_data)
+    if entries:
+        Timeline.objects.bulk_create(entries)
+        _invalidate_timeline_first_pages(entries)
 
 
 def push_to_timeline(objects, instance:object, event_type:str, namespace:str="default", extra_data:dict={}):
@@ -70,12 +105,127 @@ def push_to_timeline(objects, instance:object, event_type:str, namespace:str="de
         raise Exception("Invalid objects parameter")
 
 
+def _make_timeline_event(objects, instance:object, event_type:str, namespace:str="default", extra_data:dict={}):
+    assert isinstance(instance, Model), "instance must be a instance of Model"
+
+    if isinstance(objects, Model):
+        objects = [objects]
+    elif not (isinstance(objects, QuerySet) or isinstance(objects, list)):
+        raise Exception("Invalid objects parameter")
+
+    impl = _get_class_implementation(instance.__class__, event_type)
+    return {
+        "objects": [[_get_content_type_for_model(obj.__class__).id, obj.pk] for obj in objects],
+        "namespace": namespace,
+        "event_type": event_type,
+        "data": impl(instance, extra_data=extra_data),
+        "created": timezone.now().isoformat(),
+    }
+
+
+def store_timeline_events(events:list):
+    """
+    Persist a list of timeline events (made with `_make_timeline_event`)
+    with one query. Entries keep the date of the event, not the date
+    they are stored.
+    """
+    from .models import Timeline
+
+    entries = []
+    for event in events:
+        created = parse_datetime(event["created"])
+        for content_type_id, object_id in event["objects"]:
+            entries.append(Timeline(content_type_id=content_type_id,
+                                    object_id=object_id,
+                                    namespace=event["namespace"],
+                                    event_type=event["event_type"],
+                                    data=event["data"],
+                                    created=created))
+    if entries:
+        Timeline.objects.bulk_create(entries)
+        _invalidate_timeline_first_pages(entries)
+
+
+def _flush_timeline_events(events:list):
+    if settings.TIMELINE_ASYNC_PUSH:
+        try:
+            deferred.call_async("timeline.store_timeline_events", events)
+            return
+        except Exception:
+            # If the task can not be queued the
+            # events are stored now, not lost.
+            log.exception("Error queuing timeline events, storing them synchronously")
+
+    store_timeline_events(events)
+
+
+def push_to_timeline_on_commit(objects, instance:object, event_type:str, namespace:str="default", extra_data:dict={}):
+    """
+    Like `push_to_timeline` but the timeline entries are written when the
+    current transaction is committed (and discarded if it is rolled back).
+
+    The payload is built now, so it reflects the state of the instance
+    at the moment of the event, and all the events of a transaction are
+    stored together with one query (in a deferred task if
+    `TIMELINE_ASYNC_PUSH` is enabled).
+    """
+    event = _make_timeline_event(objects, instance, event_type, namespace, extra_data)
+    on_commit_batch(_flush_timeline_events, event)
+
+
 def get_timeline(obj, namespace="default"):
     assert isinstance(obj, Model), "obj must be a instance of Model"
     from .models import Timeline
 
-    ct = ContentType.objects.get_for_model(obj.__class__)
-    return Timeline.objects.filter(content_type=ct, object_id=obj.pk, namespace=namespace)
+    ct = _get_content_type_for_model(obj.__class__)
+    qs = Timeline.objects.filter(content_type=ct, object_id=obj.pk, namespace=namespace)
+    return qs.order_by("-created", "-id")
+
+
+def _get_timeline_version_cache_key(content_type_id:int, object_id:int, namespace:str):
+    return "timeline:version:{0}:{1}:{2}".format(content_type_id, object_id, namespace)
+
+
+def _get_timeline_first_page_cache_key(content_type_id:int, object_id:int, namespace:str, version:int):
+    return "timeline:first-page:{0}:{1}:{2}:{3}".format(content_type_id, object_id, namespace, version)
+
+
+def _invalidate_timeline_first_pages(entries):
+    # The cached pages are not deleted, instead the version of the timeline
+    # is increased so a page being cached concurrently with a push is never
+    # served with the new version.
+    if not settings.TIMELINE_FIRST_PAGE_CACHE_ENABLED:
+        return
+
+    timelines = {(e.content_type_id, e.object_id, e.namespace) for e in entries}
+    for timeline in timelines:
+        key = _get_timeline_version_cache_key(*timeline)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+
+
+def get_timeline_first_page(obj, queryset, limit:int, namespace:str="default"):
+    """
+    Get the first `limit` entries of the (already ordered) timeline
+    queryset of an object from cache. The cache is invalidated every
+    time an entry is pushed to the timeline.
+    """
+    if not settings.TIMELINE_FIRST_PAGE_CACHE_ENABLED:
+        return list(queryset[:limit])
+
+    ct = _get_content_type_for_model(obj.__class__)
+    version = cache.get(_get_timeline_version_cache_key(ct.id, obj.pk, namespace), 0)
+    key = _get_timeline_first_page_cache_key(ct.id, obj.pk, namespace, version)
+
+    cached = cache.get(key)
+    if cached is not None and cached[0] == limit:
+        return list(cached[1])
+
+    entries = list(queryset[:limit])
+    cache.set(key, (limit, entries), settings.TIMELINE_FIRST_PAGE_CACHE_TIMEOUT)
+    return entries
 
 
 def register_timeline_implementation(typename:str, event_type:str, fn=None):
@@ -14,7 +14,9 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from taiga.timeline.service import push_to_timeline
+from django.apps import apps
+
+from taiga.timeline.service import push_to_timeline_on_commit
 
 # TODO: Add events to followers timeline when followers are implemented.
 # TODO: Add events to project watchers timeline when project watchers are implemented.
@@ -22,35 +24,47 @@ from taiga.timeline.service import push_to_timeline
 
 def create_project_push_to_timeline(sender, instance, created, **kwargs):
     if created:
-        push_to_timeline(instance, instance, "create")
+        push_to_timeline_on_commit(instance, instance, "create")
 
 
 def create_user_story_push_to_timeline(sender, instance, created, **kwargs):
     if created:
-        push_to_timeline(instance.project, instance, "create")
+        push_to_timeline_on_commit(instance.project, instance, "create")
 
 
 def create_issue_push_to_timeline(sender, instance, created, **kwargs):
     if created:
-        push_to_timeline(instance.project, instance, "create")
-
-
-def create_membership_push_to_timeline(sender, instance, **kwargs):
-    if not instance.pk and instance.user:
-        push_to_timeline(instance.project, instance, "create")
-    elif instance.pk:
-        prev_instance = sender.objects.get(pk=instance.pk)
-        if prev_instance.user != prev_instance.user:
-            push_to_timeline(instance.project, instance, "create")
-        elif prev_instance.role != prev_instance.role:
-            extra_data = {
-                "prev_role": {
-                    "id": prev_instance.role.pk,
-                    "name": prev_instance.role.name,
-                }
+        push_to_timeline_on_commit(instance.project, instance, "create")
+
+
+def _get_membership_stored_values(instance):
+    # Read from __dict__ to not load deferred fields.
+    return (instance.__dict__.get("user_id"), instance.__dict__.get("role_id"))
+
+
+def store_membership_values(sender, instance, **kwargs):
+    instance._timeline_stored_values = _get_membership_stored_values(instance)
+
+
+def create_membership_push_to_timeline(sender, instance, created, **kwargs):
+    prev_user_id, prev_role_id = getattr(instance, "_timeline_stored_values", (None, None))
+    instance._timeline_stored_values = _get_membership_stored_values(instance)
+
+    if not instance.user_id:
+        return
+
+    if created or prev_user_id != instance.user_id:
+        push_to_timeline_on_commit(instance.project, instance, "create")
+    elif prev_role_id != instance.role_id:
+        prev_role = apps.get_model("users", "Role").objects.filter(pk=prev_role_id).first()
+        extra_data = {
+            "prev_role": {
+                "id": prev_role_id,
+                "name": prev_role.name if prev_role else None,
             }
-            push_to_timeline(instance.project, instance, "role-changed", extra_data=extra_data)
+        }
+        push_to_timeline_on_commit(instance.project, instance, "role-changed", extra_data=extra_data)
 
 
 def delete_membership_push_to_timeline(sender, instance, **kwargs):
-    push_to_timeline(instance.project, instance, "delete")
+    push_to_timeline_on_commit(instance.project, instance, "delete")
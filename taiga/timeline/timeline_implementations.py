@@ -133,4 +133,5 @@ def membership_role_changed_timeline(instance, extra_data={}):
             "name": instance.role.name,
         }
     }
-    return dict(result.items() + extra_data.items())
+    result.update(extra_data)
+    return result
@@ -0,0 +1,84 @@
+# Copyright (C) 2014 Andrey Antukh <niwi@niwi.be>
+# Copyright (C) 2014 Jesús Espino <jespinog@gmail.com>
+# Copyright (C) 2014 David Barragán <bameda@dbarragan.com>
+# Copyright (C) 2014 Anler Hernández <hello@anler.me>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import pytest
+
+from unittest.mock import patch, call, ANY
+
+from django.db import transaction
+
+from .. import factories as f
+
+
+def _userstory_calls(emit_mock):
+    return [c for c in emit_mock.mock_calls if c[1][1] == "userstories.userstory"]
+
+
+def test_events_are_emitted_once_after_commit(transactional_db):
+    project = f.ProjectFactory.create()
+
+    with patch("taiga.events.events._emit_event_for_pk") as emit_mock:
+        with transaction.atomic():
+            us1 = f.UserStoryFactory.create(project=project)
+            us2 = f.UserStoryFactory.create(project=project)
+            us1.subject = "foo"
+            us1.save()
+            us1.save()
+            assert _userstory_calls(emit_mock) == []
+
+    assert _userstory_calls(emit_mock) == [
+        call([us1.pk, us2.pk], "userstories.userstory", project.pk,
+             type="create", channel="events", sessionid=ANY),
+        call(us1.pk, "userstories.userstory", project.pk,
+             type="change", channel="events", sessionid=ANY),
+    ]
+
+
+def test_events_are_dropped_on_rollback(transactional_db):
+    project = f.ProjectFactory.create()
+
+    with patch("taiga.events.events._emit_event_for_pk") as emit_mock:
+        try:
+            with transaction.atomic():
+                f.UserStoryFactory.create(project=project)
+                raise ValueError("rollback")
+        except ValueError:
+            pass
+
+    assert _userstory_calls(emit_mock) == []
+
+
+def test_events_of_released_savepoints_survive_sibling_rollback(transactional_db):
+    project = f.ProjectFactory.create()
+
+    with patch("taiga.events.events._emit_event_for_pk") as emit_mock:
+        with transaction.atomic():
+            us1 = f.UserStoryFactory.create(project=project)
+            with transaction.atomic():
+                us2 = f.UserStoryFactory.create(project=project)
+
+            try:
+                with transaction.atomic():
+                    f.UserStoryFactory.create(project=project)
+                    raise ValueError("rollback")
+            except ValueError:
+                pass
+
+    assert _userstory_calls(emit_mock) == [
+        call([us1.pk, us2.pk], "userstories.userstory", project.pk,
+             type="create", channel="events", sessionid=ANY),
+    ]
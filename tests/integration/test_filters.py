@@ -0,0 +1,120 @@
+# Copyright (C) 2014 Andrey Antukh <niwi@niwi.be>
+# Copyright (C) 2014 Jesús Espino <jespinog@gmail.com>
+# Copyright (C) 2014 David Barragán <bameda@dbarragan.com>
+# Copyright (C) 2014 Anler Hernández <hello@anler.me>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import pytest
+
+from unittest.mock import MagicMock
+
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+
+from taiga.base import filters
+from taiga.projects.issues.models import Issue
+from taiga.projects.models import Project
+
+from .. import factories as f
+
+pytestmark = pytest.mark.django_db
+
+
+def _get_query_plan(queryset):
+    sql, params = queryset.query.sql_with_params()
+    cursor = connection.cursor()
+    try:
+        cursor.execute("EXPLAIN " + sql, params)
+        return "\n".join(row[0] for row in cursor.fetchall())
+    finally:
+        cursor.close()
+
+
+def _make_request(user):
+    request = MagicMock()
+    request.user = user
+    request.QUERY_PARAMS = {}
+    return request
+
+
+def test_permission_based_filter_backend_uses_a_subquery():
+    user = f.UserFactory.create()
+    project1 = f.ProjectFactory.create(public_permissions=[])
+    project2 = f.ProjectFactory.create(public_permissions=[])
+    project3 = f.ProjectFactory.create(public_permissions=["view_issues"])
+    role1 = f.RoleFactory.create(project=project1, permissions=["view_issues"])
+    role2 = f.RoleFactory.create(project=project2, permissions=[])
+    f.MembershipFactory.create(project=project1, user=user, role=role1)
+    f.MembershipFactory.create(project=project2, user=user, role=role2)
+
+    issue1 = f.IssueFactory.create(project=project1)
+    f.IssueFactory.create(project=project2)
+    issue3 = f.IssueFactory.create(project=project3)
+
+    backend = filters.CanViewIssuesFilterBackend()
+    qs = backend.filter_queryset(_make_request(user), Issue.objects.all(), MagicMock(spec=[]))
+
+    sql = str(qs.query)
+    assert "DISTINCT" not in sql
+    assert "IN (SELECT" in sql
+    assert "Unique" not in _get_query_plan(qs)
+    assert sorted(x.id for x in qs) == sorted([issue1.id, issue3.id])
+
+    qs = backend.filter_queryset(_make_request(AnonymousUser()), Issue.objects.all(), MagicMock(spec=[]))
+    assert list(qs) == []
+
+
+def test_can_view_project_obj_filter_backend_uses_a_subquery():
+    user = f.UserFactory.create()
+    project1 = f.ProjectFactory.create(public_permissions=[])
+    project2 = f.ProjectFactory.create(public_permissions=[])
+    role1 = f.RoleFactory.create(project=project1, permissions=["view_project"])
+    f.MembershipFactory.create(project=project1, user=user, role=role1)
+    f.MembershipFactory.create(project=project2, user=f.UserFactory.create(), is_owner=True)
+
+    backend = filters.CanViewProjectObjFilterBackend()
+    qs = backend.filter_queryset(_make_request(user), Project.objects.all(), MagicMock(spec=[]))
+
+    sql = str(qs.query)
+    assert "DISTINCT" not in sql
+    assert "IN (SELECT" in sql
+    assert "Unique" not in _get_query_plan(qs)
+    assert [x.id for x in qs.filter(id__in=[project1.id, project2.id])] == [project1.id]
+
+
+def test_is_project_member_filter_backend_uses_a_subquery():
+    user = f.UserFactory.create()
+    project1 = f.ProjectFactory.create()
+    project2 = f.ProjectFactory.create(public_permissions=["view_issues"])
+    f.MembershipFactory.create(project=project1, user=user)
+    f.MembershipFactory.create(project=project2, user=f.UserFactory.create())
+
+    issue1 = f.IssueFactory.create(project=project1)
+    issue2 = f.IssueFactory.create(project=project2)
+
+    backend = filters.IsProjectMemberFilterBackend()
+    qs = backend.filter_queryset(_make_request(user), Issue.objects.all(), MagicMock(spec=[]))
+
+    sql = str(qs.query)
+    assert "DISTINCT" not in sql
+    assert "IN (SELECT" in sql
+    assert "Unique" not in _get_query_plan(qs)
+    assert [x.id for x in qs] == [issue1.id]
+
+    superuser = f.UserFactory.create(is_superuser=True)
+    qs = backend.filter_queryset(_make_request(superuser), Issue.objects.all(), MagicMock(spec=[]))
+    assert sorted(x.id for x in qs) == sorted([issue1.id, issue2.id])
+
+    qs = backend.filter_queryset(_make_request(AnonymousUser()), Issue.objects.all(), MagicMock(spec=[]))
+    assert list(qs) == []
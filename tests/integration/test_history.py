@@ -21,12 +21,16 @@ from unittest.mock import MagicMock
 from unittest.mock import patch
 
 from django.core.urlresolvers import reverse
+from django.db.models.query import QuerySet
 from .. import factories as f
 
 from taiga.projects.history import services
 from taiga.projects.history.models import HistoryEntry
+from taiga.projects.history.models import HistorySnapshot
+from taiga.projects.history.models import PendingSnapshot
 from taiga.projects.history.choices import HistoryType
 from taiga.projects.history.services import make_key_from_model_object
+from taiga.projects.services.stats import _get_wiki_changes_per_member_stats
 
 pytestmark = pytest.mark.django_db
 
@@ -232,3 +236,186 @@ def test_delete_comment_by_project_owner(client):
     url = "%s?id=%s"%(url, history_entry.id)
     response = client.post(url, content_type="application/json")
     assert 200 == response.status_code, response.status_code
+
+
+def test_take_snapshot_updates_materialized_snapshot():
+    issue = f.IssueFactory.create()
+    key = make_key_from_model_object(issue)
+
+    services.take_snapshot(issue, user=issue.owner)
+    materialized = HistorySnapshot.objects.get(key=key)
+    assert materialized.partials == 0
+
+    issue.subject = "foo"
+    issue.save()
+    services.take_snapshot(issue, user=issue.owner)
+
+    materialized = HistorySnapshot.objects.get(key=key)
+    assert materialized.partials == 1
+    assert materialized.snapshot["subject"] == "foo"
+
+    snapshot, partials = services.rebuild_snapshot_for_key(key)
+    assert snapshot == materialized.snapshot
+    assert partials == 1
+
+
+def test_store_snapshot_for_key_create_race():
+    issue = f.IssueFactory.create()
+    key = make_key_from_model_object(issue)
+    HistorySnapshot.objects.create(key=key, snapshot={"subject": "old"}, partials=0)
+
+    real_update = QuerySet.update
+    calls = []
+
+    def update(self, **kwargs):
+        # The first update does not see the row of the concurrent writer
+        calls.append(kwargs)
+        if len(calls) == 1:
+            return 0
+        return real_update(self, **kwargs)
+
+    with patch.object(QuerySet, "update", update):
+        services.store_snapshot_for_key(key, {"subject": "new"}, 2)
+
+    assert len(calls) == 2
+    materialized = HistorySnapshot.objects.get(key=key)
+    assert materialized.snapshot == {"subject": "new"}
+    assert materialized.partials == 2
+
+
+def test_take_snapshots_bulk():
+    project = f.create_project()
+    task1 = f.TaskFactory.create(project=project)
+    task2 = f.TaskFactory.create(project=project)
+    services.take_snapshot(task1, user=task1.owner)
+
+    qs_all = HistoryEntry.objects.all()
+    qs_created = qs_all.filter(type=HistoryType.create)
+    qs_hidden = qs_all.filter(is_hidden=True)
+
+    materialized_id = HistorySnapshot.objects.get(key=make_key_from_model_object(task1)).id
+
+    task1.us_order = 3
+    task1.save()
+
+    entries = services.take_snapshots_bulk([task1, task2], user=task1.owner)
+
+    # Existing materialized snapshots are updated, not replaced
+    assert HistorySnapshot.objects.get(key=make_key_from_model_object(task1)).id == materialized_id
+
+    assert len(entries) == 2
+    assert qs_all.count() == 3
+    assert qs_created.count() == 2
+    assert qs_hidden.count() == 1
+    assert HistorySnapshot.objects.get(key=make_key_from_model_object(task1)).partials == 1
+    assert HistorySnapshot.objects.get(key=make_key_from_model_object(task2)).partials == 0
+
+    # Without changes no new entries are created
+    assert services.take_snapshots_bulk([task1, task2], user=task1.owner) == []
+    assert qs_all.count() == 3
+
+
+def test_take_snapshot_async():
+    issue = f.IssueFactory.create()
+    key = make_key_from_model_object(issue)
+
+    qs_all = HistoryEntry.objects.all()
+    qs_pending = PendingSnapshot.objects.filter(key=key)
+
+    pending = services.take_snapshot_async(issue, comment="foo", user=issue.owner)
+    assert pending.key == key
+    assert qs_pending.count() == 1
+    assert qs_all.count() == 0
+
+    issue.subject = "bar"
+    issue.save()
+    services.take_snapshot_async(issue, user=issue.owner)
+
+    entries = services.persist_pending_snapshots(key)
+
+    assert qs_pending.count() == 0
+    assert qs_all.count() == 2
+    assert [entry.type for entry, notify in entries] == [HistoryType.create, HistoryType.change]
+    assert entries[0][0].comment == "foo"
+    assert entries[1][0].diff["subject"][1] == "bar"
+
+
+def test_compact_history_for_key():
+    task = f.TaskFactory.create(us_order=0)
+    key = make_key_from_model_object(task)
+    services.take_snapshot(task, user=task.owner)
+
+    for order in range(1, 4):
+        task.us_order = order
+        task.save()
+        services.take_snapshot(task, user=task.owner)
+
+    qs_all = HistoryEntry.objects.filter(key=key)
+    qs_hidden = qs_all.filter(is_hidden=True)
+    assert qs_hidden.count() == 3
+
+    assert services.compact_history_for_key(key) == 2
+    assert qs_all.count() == 2
+    assert qs_hidden.count() == 1
+    assert qs_hidden.get().diff["us_order"] == [0, 3]
+
+    snapshot, partials = services.rebuild_snapshot_for_key(key)
+    assert snapshot["us_order"] == 3
+    assert partials == 1
+
+
+def test_values_diff_is_precomputed_on_write():
+    issue = f.IssueFactory.create(description="foo")
+    services.take_snapshot(issue, user=issue.owner)
+    issue.description = "bar"
+    issue.save()
+    entry = services.take_snapshot(issue, user=issue.owner)
+
+    entry = HistoryEntry.objects.get(pk=entry.pk)
+    assert "description_diff" in entry.values_diff_cache
+    assert entry.values_diff == entry.values_diff_cache
+
+
+def test_history_resource_cursor_pagination(client):
+    project = f.create_project()
+    us = f.create_userstory(project=project)
+    membership = f.MembershipFactory.create(project=project, user=project.owner, is_owner=True)
+    key = make_key_from_model_object(us)
+
+    entries = [f.HistoryEntryFactory.create(type=HistoryType.change, comment="comment {}".format(i), key=key)
+               for i in range(3)]
+
+    client.login(project.owner)
+    url = reverse("userstory-history-detail", args=(us.id,))
+
+    response = client.get(url, {"page_size": 2})
+    assert response.status_code == 200
+    assert [x["id"] for x in response.data] == [x.id for x in entries[:2]]
+    assert "X-Pagination-Prev" not in response
+
+    response = client.get(response["X-Pagination-Next"])
+    assert response.status_code == 200
+    assert [x["id"] for x in response.data] == [entries[2].id]
+    assert "X-Pagination-Next" not in response
+
+    response = client.get(response["X-Pagination-Prev"])
+    assert response.status_code == 200
+    assert [x["id"] for x in response.data] == [x.id for x in entries[:2]]
+
+    response = client.get(url, {"before": "not-valid"})
+    assert response.status_code == 400
+
+
+def test_history_entries_are_project_scoped():
+    wiki_page = f.WikiPageFactory.create(content="foo")
+    services.take_snapshot(wiki_page, user=wiki_page.owner)
+    wiki_page.content = "bar"
+    wiki_page.save()
+    services.take_snapshot(wiki_page, user=wiki_page.owner)
+
+    qs = HistoryEntry.objects.filter(project=wiki_page.project,
+                                     content_type__model="wikipage")
+    assert qs.count() == 2
+
+    stats = _get_wiki_changes_per_member_stats(wiki_page.project)
+    assert stats == {wiki_page.owner.pk: 2}
@@ -18,10 +18,12 @@
 import json
 import pytest
 import time
+from datetime import timedelta
 from unittest.mock import MagicMock, patch
 
 from django.core.urlresolvers import reverse
 from django.apps import apps
+from django.utils import timezone
 from .. import factories as f
 
 from taiga.projects.notifications import services
@@ -88,16 +90,34 @@ def test_analize_object_for_watchers():
     user2 = f.UserFactory.create()
 
     issue = MagicMock()
-    issue.description = "Foo @{0} @{1} ".format(user1.username,
-                                                user2.username)
-    issue.content = ""
 
+    mention_tmpl = '<a class="mention" href="/profile/{0}" title="{0}">&commat;{0}</a>'
     history = MagicMock()
-    history.comment = ""
+    history.diff = {"description_html": ["", "<p>Foo {0} {1}</p>".format(mention_tmpl.format(user1.username),
+                                                                      mention_tmpl.format(user2.username))]}
+    history.comment_html = ""
+
+    services.analize_object_for_watchers(issue, history)
+    assert issue.watchers.add.call_count == 1
+    assert set(issue.watchers.add.call_args[0]) == {user1, user2}
+
+
+def test_analize_object_for_watchers_on_create():
+    user1 = f.UserFactory.create()
+    user2 = f.UserFactory.create()
+
+    issue = f.IssueFactory.create(description="Foo @{0}".format(user1.username))
+    history = take_snapshot(issue, user=issue.owner)
+    assert history.type == HistoryType.create
 
     services.analize_object_for_watchers(issue, history)
-    assert issue.watchers.add.call_count == 2
+    assert set(issue.watchers.all()) == {user1}
 
+    wikipage = f.WikiPageFactory.create(content="Foo @{0}".format(user2.username))
+    history = take_snapshot(wikipage, user=wikipage.owner)
+
+    services.analize_object_for_watchers(wikipage, history)
+    assert set(wikipage.watchers.all()) == {user2}
 
 def test_users_to_notify():
     project = f.ProjectFactory.create()
@@ -159,6 +179,20 @@ def test_users_to_notify():
     assert users == {member1.user, issue.get_owner()}
 
 
+def test_users_to_notify_does_not_create_policies():
+    project = f.ProjectFactory.create()
+    role = f.RoleFactory.create(project=project, permissions=['view_issues'])
+    member = f.MembershipFactory.create(project=project, role=role)
+    issue = f.IssueFactory.create(project=project, owner=member.user)
+
+    policy_model_cls = apps.get_model("notifications", "NotifyPolicy")
+    policy_model_cls.objects.filter(project=project).delete()
+
+    users = services.get_users_to_notify(issue)
+    assert users == {member.user}
+    assert policy_model_cls.objects.filter(project=project).count() == 0
+
+
 def test_send_notifications_using_services_method(settings, mail):
     settings.CHANGE_NOTIFICATIONS_MIN_INTERVAL = 1
 
@@ -278,6 +312,40 @@ def test_resource_notification_test(client, settings, mail):
         assert models.HistoryChangeNotification.objects.count() == 0
 
 
+def test_resource_delete_notification_with_async_history(client, settings):
+    settings.CHANGE_NOTIFICATIONS_MIN_INTERVAL = 1
+    settings.HISTORY_ASYNC_PERSISTENCE = True
+
+    user1 = f.UserFactory.create()
+    user2 = f.UserFactory.create()
+    project = f.ProjectFactory.create(owner=user1)
+    role = f.RoleFactory.create(project=project, permissions=["view_issues"])
+    f.MembershipFactory.create(project=project, user=user1, role=role, is_owner=True)
+    f.MembershipFactory.create(project=project, user=user2, role=role)
+    issue = f.IssueFactory.create(owner=user2, project=project)
+
+    mock_path = "taiga.projects.issues.api.IssueViewSet.pre_conditions_on_save"
+    url = reverse("issues-detail", args=[issue.pk])
+
+    client.login(user1)
+
+    with patch(mock_path) as m:
+        data = {"subject": "Fooooo", "version": issue.version}
+        response = client.patch(url, json.dumps(data), content_type="application/json")
+        assert response.status_code == 200
+        assert models.HistoryChangeNotification.objects.count() == 0
+
+    with patch(mock_path) as m:
+        response = client.delete(url)
+        assert response.status_code == 204
+
+    # The pending change is persisted before the delete entry
+    # and both of them are notified in the delete request.
+    history_types = (models.HistoryChangeNotification.objects
+                     .order_by("id")
+                     .values_list("history_type", flat=True))
+    assert list(history_types) == [HistoryType.create, HistoryType.delete]
+
 def test_watchers_assignation_for_issue(client):
     user1 = f.UserFactory.create()
     user2 = f.UserFactory.create()
@@ -447,3 +515,201 @@ def test_retrieve_notify_policies_by_anonymous_user(client):
     response = client.get(url, content_type="application/json")
     assert response.status_code == 404, response.status_code
     assert json.loads(response.content.decode("utf-8"))["_error_message"] == "No NotifyPolicy matches the given query.", response.content
+
+
+def test_notification_emails_are_rendered_once_per_language():
+    from django.core.mail import EmailMultiAlternatives
+
+    user1 = f.UserFactory.create(default_language="es")
+    user2 = f.UserFactory.create(default_language="es")
+    user3 = f.UserFactory.create(default_language="")
+
+    def make_email_object(to, context, **kwargs):
+        return EmailMultiAlternatives(subject=context.get("lang", ""), to=[to])
+
+    with patch("djmail.template_mail.TemplateMail.make_email_object",
+               side_effect=make_email_object) as make_email_mock:
+        emails = services._make_emails("issues/issue-change", {}, [user1, user2, user3])
+
+    assert make_email_mock.call_count == 2
+    assert [(email.to, email.subject) for email in emails] == [([user1.email], "es"),
+                                                               ([user2.email], "es"),
+                                                               ([user3.email], "")]
+    assert services._make_template_mail("foo").__class__ is services._make_template_mail("foo").__class__
+
+
+def test_send_notifications_batch_commits_each_notification(settings, mail):
+    settings.CHANGE_NOTIFICATIONS_MIN_INTERVAL = 1
+
+    project = f.ProjectFactory.create()
+    role = f.RoleFactory.create(project=project, permissions=['view_issues'])
+    member1 = f.MembershipFactory.create(project=project, role=role)
+    member2 = f.MembershipFactory.create(project=project, role=role)
+
+    history = MagicMock()
+    history.owner = member2.user
+    history.user = {"pk": member2.user.pk}
+    history.comment = ""
+    history.type = HistoryType.change
+    history.is_hidden = False
+
+    for i in range(2):
+        issue = f.IssueFactory.create(project=project, owner=member2.user)
+        issue.watchers.add(member1.user)
+        take_snapshot(issue)
+        services.send_notifications(issue, history=history)
+
+    ready_datetime = timezone.now() - timedelta(seconds=10)
+    models.HistoryChangeNotification.objects.update(updated_datetime=ready_datetime)
+
+    send_notification = services._send_notification
+
+    def send_or_fail(notification, **kwargs):
+        if mail.outbox:
+            raise IOError("Error sending email")
+        return send_notification(notification, **kwargs)
+
+    with patch("taiga.projects.notifications.services._send_notification", side_effect=send_or_fail), \
+            patch("taiga.projects.notifications.services._claim_notifications",
+                  wraps=services._claim_notifications) as claim_mock:
+        with pytest.raises(IOError):
+            services.process_sync_notifications()
+
+    # The email already sent is not sent again in the next run
+    assert len(mail.outbox) == 1
+    assert models.HistoryChangeNotification.objects.count() == 1
+
+    # One worker does not need SKIP LOCKED (PostgreSQL 9.5+)
+    assert all(not kwargs["skip_locked"] for args, kwargs in claim_mock.call_args_list)
+
+def test_send_digest_notifications(settings, mail):
+    settings.CHANGE_NOTIFICATIONS_MIN_INTERVAL = 1
+    settings.CHANGE_NOTIFICATIONS_DIGEST = True
+
+    project = f.ProjectFactory.create()
+    role = f.RoleFactory.create(project=project, permissions=['view_issues', 'view_us'])
+    member1 = f.MembershipFactory.create(project=project, role=role)
+    member2 = f.MembershipFactory.create(project=project, role=role)
+
+    history = MagicMock()
+    history.owner = member2.user
+    history.user = {"pk": member2.user.pk}
+    history.comment = ""
+    history.type = HistoryType.change
+    history.is_hidden = False
+
+    issue = f.IssueFactory.create(project=project, owner=member2.user)
+    issue.watchers.add(member1.user)
+    take_snapshot(issue)
+    services.send_notifications(issue, history=history)
+
+    us = f.UserStoryFactory.create(project=project, owner=member2.user)
+    us.watchers.add(member1.user)
+    take_snapshot(us)
+    services.send_notifications(us, history=history)
+
+    assert models.HistoryChangeNotification.objects.count() == 2
+    time.sleep(1)
+    services.process_sync_notifications()
+
+    assert len(mail.outbox) == 1
+    assert mail.outbox[0].to == [member1.user.email]
+    assert models.HistoryChangeNotification.objects.count() == 0
+
+
+def test_send_digest_notifications_groups_by_recipient(settings, mail):
+    settings.CHANGE_NOTIFICATIONS_MIN_INTERVAL = 1
+    settings.CHANGE_NOTIFICATIONS_DIGEST = True
+
+    project = f.ProjectFactory.create()
+    role = f.RoleFactory.create(project=project, permissions=['view_issues'])
+    member1 = f.MembershipFactory.create(project=project, role=role)
+    member2 = f.MembershipFactory.create(project=project, role=role)
+    member3 = f.MembershipFactory.create(project=project, role=role)
+
+    history = MagicMock()
+    history.owner = member2.user
+    history.user = {"pk": member2.user.pk}
+    history.comment = ""
+    history.type = HistoryType.change
+    history.is_hidden = False
+
+    for i in range(3):
+        issue = f.IssueFactory.create(project=project, owner=member2.user)
+        issue.watchers.add(member1.user)
+        if i == 0:
+            issue.watchers.add(member3.user)
+        take_snapshot(issue)
+        services.send_notifications(issue, history=history)
+
+    ready_datetime = timezone.now() - timedelta(seconds=10)
+    models.HistoryChangeNotification.objects.update(updated_datetime=ready_datetime)
+
+    # More notifications than the batch size still make one digest per user
+    with patch("taiga.projects.notifications.services._get_digest_change",
+               wraps=services._get_digest_change) as change_mock:
+        services.process_sync_notifications(batch_size=1)
+
+    assert sorted(email.to[0] for email in mail.outbox) == sorted([member1.user.email,
+                                                                  member3.user.email])
+    assert change_mock.call_count == 4
+    assert models.HistoryChangeNotification.objects.count() == 0
+
+def test_send_digest_notifications_skips_notifications_changed_while_sending(settings, mail):
+    settings.CHANGE_NOTIFICATIONS_MIN_INTERVAL = 1
+    settings.CHANGE_NOTIFICATIONS_DIGEST = True
+
+    project = f.ProjectFactory.create()
+    role = f.RoleFactory.create(project=project, permissions=['view_issues'])
+    member1 = f.MembershipFactory.create(project=project, role=role)
+    member2 = f.MembershipFactory.create(project=project, role=role)
+
+    history = MagicMock()
+    history.owner = member2.user
+    history.user = {"pk": member2.user.pk}
+    history.comment = ""
+    history.type = HistoryType.change
+    history.is_hidden = False
+
+    issue = f.IssueFactory.create(project=project, owner=member2.user)
+    issue.watchers.add(member1.user)
+    take_snapshot(issue)
+    services.send_notifications(issue, history=history)
+
+    ready_datetime = timezone.now() - timedelta(seconds=10)
+    models.HistoryChangeNotification.objects.update(updated_datetime=ready_datetime)
+
+    lock_ready_notifications = services._lock_ready_notifications
+
+    def change_and_lock(ids, max_updated_datetime):
+        # A new change is notified after the pending ones are read
+        services.send_notifications(issue, history=history)
+        return lock_ready_notifications(ids, max_updated_datetime)
+
+    with patch("taiga.projects.notifications.services._lock_ready_notifications",
+               side_effect=change_and_lock):
+        services.process_sync_notifications()
+
+    # The notification is kept, with its user, for the next window
+    assert len(mail.outbox) == 0
+    notification = models.HistoryChangeNotification.objects.get()
+    assert list(notification.notify_users.all()) == [member1.user]
+
+def test_send_notifications_for_history_deferred_task(settings):
+    from taiga.projects.notifications import deferred
+
+    settings.CHANGE_NOTIFICATIONS_MIN_INTERVAL = 1
+
+    project = f.ProjectFactory.create()
+    role = f.RoleFactory.create(project=project, permissions=['view_issues'])
+    member1 = f.MembershipFactory.create(project=project, role=role)
+    member2 = f.MembershipFactory.create(project=project, role=role)
+
+    issue = f.IssueFactory.create(project=project, owner=member1.user)
+    history = take_snapshot(issue, comment="Hi @{}".format(member2.user.username), user=member1.user)
+
+    deferred.send_notifications_for_history(history.id)
+
+    assert member2.user in issue.watchers.all()
+    notification = models.HistoryChangeNotification.objects.get()
+    assert set(notification.notify_users.all()) == {member2.user}
@@ -1,6 +1,9 @@
 import pytest
 
+from unittest.mock import patch
+
 from taiga.permissions import service, permissions
+from taiga.projects.models import Membership
 from django.contrib.auth.models import AnonymousUser
 
 from .. import factories
@@ -113,3 +116,48 @@ def test_authenticated_user_has_perm_on_project_related_object():
 def test_authenticated_user_has_perm_on_invalid_object():
     user1 = factories.UserFactory()
     assert service.user_has_perm(user1, "test", user1) == False
+
+
+def test_request_cache_of_user_project_permissions():
+    user1 = factories.UserFactory.create()
+    project = factories.ProjectFactory()
+    role = factories.RoleFactory(project=project, permissions=["test1"])
+    membership = factories.MembershipFactory(user=user1, project=project, role=role)
+
+    service.activate_request_cache()
+    try:
+        with patch.object(Membership.objects, "get", wraps=Membership.objects.get) as get_mock:
+            assert service.get_user_project_permissions(user1, project) == set(["test1"])
+            assert service.get_user_project_permissions(user1, project) == set(["test1"])
+            assert service._get_user_project_membership(user1, project) == membership
+            assert get_mock.call_count == 1
+
+            role.permissions = ["test1", "test2"]
+            role.save()
+            assert service.get_user_project_permissions(user1, project) == set(["test1", "test2"])
+            assert get_mock.call_count == 2
+    finally:
+        service.deactivate_request_cache()
+
+
+def test_shared_cache_of_user_project_permissions(settings):
+    settings.PERMISSIONS_CACHE_ENABLED = True
+
+    user1 = factories.UserFactory.create()
+    project = factories.ProjectFactory()
+    role = factories.RoleFactory(project=project, permissions=["test1"])
+    factories.MembershipFactory(user=user1, project=project, role=role)
+
+    with patch.object(Membership.objects, "get", wraps=Membership.objects.get) as get_mock:
+        assert service.get_user_project_permissions(user1, project) == set(["test1"])
+        assert service.get_user_project_permissions(user1, project) == set(["test1"])
+        assert get_mock.call_count == 1
+
+        role.permissions = ["test1", "test2"]
+        role.save()
+        assert service.get_user_project_permissions(user1, project) == set(["test1", "test2"])
+        assert get_mock.call_count == 2
+
+        project.anon_permissions = ["test3"]
+        project.save()
+        assert service.get_user_project_permissions(AnonymousUser(), project) == set(["test3"])
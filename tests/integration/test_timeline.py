@@ -18,6 +18,13 @@
 import json
 import pytest
 
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.core.urlresolvers import reverse
+from django.db import transaction
+from django.utils import timezone
+
 from .. import factories
 
 from taiga.timeline import service
@@ -59,3 +66,198 @@ def test_get_timeline():
     assert service.get_timeline(user1).count() == 4
     assert service.get_timeline(user2).count() == 1
     assert service.get_timeline(user3).count() == 0
+
+
+def test_push_to_timeline_many_objects():
+    Timeline.objects.all().delete()
+    user1 = factories.UserFactory()
+    user2 = factories.UserFactory()
+    user3 = factories.UserFactory()
+
+    service.register_timeline_implementation("users.user", "test", lambda x, extra_data=None: str(id(x)))
+
+    service.push_to_timeline([user1, user2], user3, "test")
+
+    assert service.get_timeline(user1).count() == 1
+    assert service.get_timeline(user2).count() == 1
+    assert service.get_timeline(user1)[0].data == service.get_timeline(user2)[0].data
+
+
+def test_store_timeline_events():
+    Timeline.objects.all().delete()
+    user1 = factories.UserFactory()
+    user2 = factories.UserFactory()
+    user3 = factories.UserFactory()
+
+    service.register_timeline_implementation("users.user", "test", lambda x, extra_data=None: str(id(x)))
+
+    events = [
+        service._make_timeline_event([user1, user2], user3, "test"),
+        service._make_timeline_event(user3, user1, "test"),
+    ]
+    service.store_timeline_events(events)
+
+    assert service.get_timeline(user1).count() == 1
+    assert service.get_timeline(user2).count() == 1
+    assert service.get_timeline(user3).count() == 1
+    assert service.get_timeline(user3)[0].data == id(user1)
+
+
+def test_store_timeline_events_keeps_the_event_date():
+    user1 = factories.UserFactory()
+    user2 = factories.UserFactory()
+
+    service.register_timeline_implementation("users.user", "test", lambda x, extra_data=None: str(id(x)))
+
+    created = timezone.now() - timedelta(minutes=5)
+    with patch("taiga.timeline.service.timezone.now", return_value=created):
+        event = service._make_timeline_event(user1, user2, "test")
+
+    service.store_timeline_events([event])
+
+    assert service.get_timeline(user1)[0].created == created
+
+
+def test_flush_timeline_events_fallback_when_queue_fails(settings):
+    settings.TIMELINE_ASYNC_PUSH = True
+    user1 = factories.UserFactory()
+    user2 = factories.UserFactory()
+
+    service.register_timeline_implementation("users.user", "test", lambda x, extra_data=None: str(id(x)))
+    event = service._make_timeline_event(user1, user2, "test")
+
+    with patch("taiga.timeline.service.deferred.call_async", side_effect=Exception("broker down")):
+        service._flush_timeline_events([event])
+
+    assert service.get_timeline(user1).count() == 1
+
+def test_membership_role_change_push_to_timeline():
+    membership = factories.MembershipFactory()
+    new_role = factories.RoleFactory(project=membership.project)
+    prev_role = membership.role
+
+    with patch("taiga.timeline.signals.push_to_timeline_on_commit") as push_mock:
+        membership.role = new_role
+        membership.save()
+
+        assert push_mock.call_count == 1
+        args, kwargs = push_mock.call_args
+        assert args == (membership.project, membership, "role-changed")
+        assert kwargs["extra_data"] == {"prev_role": {"id": prev_role.id, "name": prev_role.name}}
+
+        push_mock.reset_mock()
+        membership.save()
+        assert push_mock.call_count == 0
+
+
+def test_timeline_entries_are_written_on_commit(transactional_db):
+    project = factories.ProjectFactory.create()
+
+    def get_issue_ids():
+        entries = service.get_timeline(project).filter(event_type="create")
+        return [entry.data["issue"]["id"] for entry in entries if "issue" in entry.data]
+
+    with transaction.atomic():
+        issue = factories.IssueFactory.create(project=project)
+        assert get_issue_ids() == []
+
+    assert get_issue_ids() == [issue.id]
+
+
+def test_timeline_entries_are_discarded_on_rollback(transactional_db):
+    project = factories.ProjectFactory.create()
+    Timeline.objects.all().delete()
+
+    try:
+        with transaction.atomic():
+            factories.IssueFactory.create(project=project)
+            raise ValueError("rollback")
+    except ValueError:
+        pass
+
+    assert Timeline.objects.count() == 0
+
+def test_timeline_resource_cursor_pagination(client):
+    user1 = factories.UserFactory()
+    user2 = factories.UserFactory()
+
+    service.register_timeline_implementation("users.user", "test", lambda x, extra_data=None: str(id(x)))
+
+    for i in range(3):
+        service._add_to_object_timeline(user1, user2, "test")
+    entries = list(service.get_timeline(user1))
+
+    url = reverse("user-timeline-detail", args=(user1.id,))
+
+    response = client.get(url, {"page_size": 2})
+    assert response.status_code == 200
+    assert [x["id"] for x in response.data] == [x.id for x in entries[:2]]
+    assert "X-Pagination-Prev" not in response
+
+    response = client.get(response["X-Pagination-Next"])
+    assert response.status_code == 200
+    assert [x["id"] for x in response.data] == [entries[2].id]
+    assert "X-Pagination-Next" not in response
+
+    response = client.get(response["X-Pagination-Prev"])
+    assert response.status_code == 200
+    assert [x["id"] for x in response.data] == [x.id for x in entries[:2]]
+
+
+def test_timeline_first_page_cache_is_invalidated_on_push(client, settings):
+    settings.TIMELINE_FIRST_PAGE_CACHE_ENABLED = True
+    user1 = factories.UserFactory()
+    user2 = factories.UserFactory()
+
+    service.register_timeline_implementation("users.user", "test", lambda x, extra_data=None: str(id(x)))
+    service._add_to_object_timeline(user1, user2, "test")
+
+    url = reverse("user-timeline-detail", args=(user1.id,))
+
+    response = client.get(url)
+    assert len(response.data) == 1
+
+    # Entries created bypassing the timeline service are not seen
+    # until the cache is invalidated
+    Timeline.objects.create(content_object=user1, event_type="test", data="{}")
+    response = client.get(url)
+    assert len(response.data) == 1
+
+    service._add_to_object_timeline(user1, user2, "test")
+    response = client.get(url)
+    assert len(response.data) == 3
+
+
+def test_timeline_first_page_is_not_cached_by_default(client):
+    user1 = factories.UserFactory()
+    user2 = factories.UserFactory()
+
+    service.register_timeline_implementation("users.user", "test", lambda x, extra_data=None: str(id(x)))
+    service._add_to_object_timeline(user1, user2, "test")
+
+    url = reverse("user-timeline-detail", args=(user1.id,))
+
+    response = client.get(url)
+    assert len(response.data) == 1
+
+    Timeline.objects.create(content_object=user1, event_type="test", data="{}")
+    response = client.get(url)
+    assert len(response.data) == 2
+
+
+def test_timeline_resource_page_number_pagination(client):
+    user1 = factories.UserFactory()
+    user2 = factories.UserFactory()
+
+    service.register_timeline_implementation("users.user", "test", lambda x, extra_data=None: str(id(x)))
+
+    for i in range(3):
+        service._add_to_object_timeline(user1, user2, "test")
+    entries = list(service.get_timeline(user1))
+
+    url = "{0}?page=2&page_size=2".format(reverse("user-timeline-detail", args=(user1.id,)))
+    response = client.get(url)
+
+    assert response.status_code == 200
+    assert response.data["count"] == 3
+    assert [x["id"] for x in response.data["results"]] == [entries[2].id]
@@ -0,0 +1,90 @@
+# Copyright (C) 2014 Andrey Antukh <niwi@niwi.be>
+# Copyright (C) 2014 Jesús Espino <jespinog@gmail.com>
+# Copyright (C) 2014 David Barragán <bameda@dbarragan.com>
+# Copyright (C) 2014 Anler Hernández <hello@anler.me>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import pytest
+
+from django.db import transaction
+
+from taiga.base.utils.db import on_commit
+
+
+def _rolled_back(func):
+    try:
+        with transaction.atomic():
+            func()
+            raise ValueError("rollback")
+    except ValueError:
+        pass
+
+
+def test_on_commit_runs_callbacks_after_commit(transactional_db):
+    calls = []
+    with transaction.atomic():
+        on_commit(lambda: calls.append("outer"))
+        with transaction.atomic():
+            on_commit(lambda: calls.append("inner"))
+        assert calls == []
+
+    assert calls == ["outer", "inner"]
+
+
+def test_on_commit_without_transaction_runs_now(transactional_db):
+    calls = []
+    on_commit(lambda: calls.append("now"))
+    assert calls == ["now"]
+
+
+def test_on_commit_discards_callbacks_of_rolled_back_savepoint(transactional_db):
+    calls = []
+    with transaction.atomic():
+        on_commit(lambda: calls.append("outer"))
+        _rolled_back(lambda: on_commit(lambda: calls.append("inner")))
+
+    assert calls == ["outer"]
+
+
+def test_on_commit_keeps_callbacks_of_released_sibling_savepoint(transactional_db):
+    calls = []
+    with transaction.atomic():
+        with transaction.atomic():
+            on_commit(lambda: calls.append("released"))
+        _rolled_back(lambda: on_commit(lambda: calls.append("rolled-back")))
+
+    assert calls == ["released"]
+
+
+def test_on_commit_discards_released_savepoints_of_rolled_back_savepoint(transactional_db):
+    calls = []
+
+    def nested():
+        with transaction.atomic():
+            on_commit(lambda: calls.append("released"))
+
+    with transaction.atomic():
+        _rolled_back(nested)
+
+    assert calls == []
+
+
+def test_on_commit_discards_callbacks_of_rolled_back_transaction(transactional_db):
+    calls = []
+    _rolled_back(lambda: on_commit(lambda: calls.append("rolled-back")))
+
+    with transaction.atomic():
+        pass
+
+    assert calls == []
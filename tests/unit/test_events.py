@@ -0,0 +1,74 @@
+# Copyright (C) 2014 Andrey Antukh <niwi@niwi.be>
+# Copyright (C) 2014 Jesús Espino <jespinog@gmail.com>
+# Copyright (C) 2014 David Barragán <bameda@dbarragan.com>
+# Copyright (C) 2014 Anler Hernández <hello@anler.me>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+
+from unittest.mock import patch, call
+
+from taiga.events import signal_handlers
+
+
+def test_buffered_events_are_merged():
+    buffered_events = [
+        ("session", "change", "userstories.userstory", 1, 10),
+        ("session", "change", "userstories.userstory", 1, 11),
+        ("session", "change", "userstories.userstory", 1, 10),
+        ("session", "change", "issues.issue", 1, 20),
+        ("session", "delete", "userstories.userstory", 1, 12),
+        ("session", "change", "userstories.userstory", 2, 13),
+    ]
+
+    with patch("taiga.events.events._emit_event_for_pk") as emit_mock:
+        signal_handlers._emit_buffered_events(buffered_events)
+
+    assert emit_mock.mock_calls == [
+        call([10, 11], "userstories.userstory", 1, type="change", channel="events", sessionid="session"),
+        call(20, "issues.issue", 1, type="change", channel="events", sessionid="session"),
+        call(12, "userstories.userstory", 1, type="delete", channel="events", sessionid="session"),
+        call(13, "userstories.userstory", 2, type="change", channel="events", sessionid="session"),
+    ]
+
+
+def test_postgresql_backend_payloads():
+    from taiga.events.backends import postgresql
+
+    message = json.dumps({"data": {"pk": list(range(5000))}})
+
+    assert postgresql.make_payloads("small") == ["small"]
+
+    payloads = postgresql.make_payloads(message, max_payload_size=1000)
+    assert len(payloads) > 1
+    assert all(len(payload.encode("utf-8")) <= 1000 for payload in payloads)
+
+    chunks = [json.loads(payload) for payload in payloads]
+    assert len({chunk["chunk"]["id"] for chunk in chunks}) == 1
+    assert [chunk["chunk"]["index"] for chunk in chunks] == list(range(len(chunks)))
+    assert all(chunk["chunk"]["total"] == len(chunks) for chunk in chunks)
+    assert "".join(chunk["data"] for chunk in chunks) == message
+
+
+def test_signal_handlers_are_connected_only_to_watched_models():
+    from django.db.models import signals
+    from taiga.events import events
+    from taiga.projects.userstories.models import UserStory
+    from taiga.projects.history.models import HistoryEntry
+
+    assert UserStory in events.get_watched_models()
+    assert events._get_type_for_model(UserStory()) == "userstories.userstory"
+
+    assert signals.post_save.has_listeners(UserStory)
+    assert signal_handlers.on_save_any_model not in signals.post_save._live_receivers(HistoryEntry)
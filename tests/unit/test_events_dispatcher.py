@@ -0,0 +1,142 @@
+# Copyright (C) 2014 Andrey Antukh <niwi@niwi.be>
+# Copyright (C) 2014 Jesús Espino <jespinog@gmail.com>
+# Copyright (C) 2014 David Barragán <bameda@dbarragan.com>
+# Copyright (C) 2014 Anler Hernández <hello@anler.me>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import threading
+
+from unittest import mock
+
+from taiga.events import dispatcher
+
+
+class FakeBackend:
+    def __init__(self):
+        self.published = []
+        self.lock = threading.Lock()
+
+    def emit_events(self, events, *, retry=False):
+        with self.lock:
+            self.published.extend(events)
+
+
+def _make_dispatcher(backend, **kwargs):
+    return dispatcher.EventsDispatcher(backend_factory=lambda: backend, **kwargs)
+
+
+def test_events_are_flushed_on_stop():
+    backend = FakeBackend()
+    events_dispatcher = _make_dispatcher(backend)
+
+    for i in range(10):
+        events_dispatcher.dispatch(str(i), routing_key="key")
+    events_dispatcher.stop()
+
+    assert [message for message, _, _ in backend.published] == [str(i) for i in range(10)]
+    assert events_dispatcher.stats == {"queued": 0, "sent": 10, "dropped": 0, "errors": 0}
+
+
+def test_drop_oldest_overflow_policy():
+    backend = FakeBackend()
+    events_dispatcher = _make_dispatcher(backend, queue_size=2, overflow_policy=dispatcher.DROP_OLDEST)
+    # Worker thread not running, so the queue is never drained
+    events_dispatcher.start = lambda: None
+
+    for i in range(4):
+        events_dispatcher.dispatch(str(i), routing_key="key")
+
+    assert events_dispatcher.stats["queued"] == 2
+    assert events_dispatcher.stats["dropped"] == 2
+    assert [events_dispatcher.queue.get()[0] for _ in range(2)] == ["2", "3"]
+
+
+def test_sync_overflow_policy():
+    backend = FakeBackend()
+    events_dispatcher = _make_dispatcher(backend, queue_size=1, overflow_policy=dispatcher.SYNC)
+    events_dispatcher.start = lambda: None
+
+    events_dispatcher.dispatch("0", routing_key="key")
+    events_dispatcher.dispatch("1", routing_key="key")
+
+    assert backend.published == [("1", "key", "events")]
+    assert events_dispatcher.stats["queued"] == 1
+
+
+def test_worker_recycles_database_connections():
+    backend = FakeBackend()
+    events_dispatcher = _make_dispatcher(backend)
+
+    with mock.patch("taiga.events.dispatcher.close_old_connections") as close_mock:
+        events_dispatcher.dispatch("0", routing_key="key")
+        events_dispatcher.stop()
+
+    assert close_mock.call_count == 2
+
+
+def test_stats_are_updated_from_several_threads():
+    backend = FakeBackend()
+    events_dispatcher = _make_dispatcher(backend)
+
+    def publish():
+        for i in range(1000):
+            events_dispatcher._publish([("0", "key", "events")])
+
+    threads = [threading.Thread(target=publish) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert events_dispatcher.stats["sent"] == 4000
+
+
+def test_stop_with_a_full_queue_honors_the_timeout():
+    backend = FakeBackend()
+    events_dispatcher = _make_dispatcher(backend, queue_size=1)
+    # Worker blocked publishing (like with the broker down)
+    backend.lock.acquire()
+
+    try:
+        events_dispatcher.dispatch("0", routing_key="key")
+        events_dispatcher.dispatch("1", routing_key="key")
+        events_dispatcher.stop(timeout=0.1)
+        assert events_dispatcher._thread is None
+    finally:
+        backend.lock.release()
+
+
+def test_drop_oldest_never_drops_the_stop_mark():
+    backend = FakeBackend()
+    events_dispatcher = _make_dispatcher(backend, queue_size=1, overflow_policy=dispatcher.DROP_OLDEST)
+    events_dispatcher.start = lambda: None
+
+    events_dispatcher.queue.put(dispatcher._STOP)
+    events_dispatcher.dispatch("0", routing_key="key")
+
+    assert events_dispatcher.queue.get_nowait() is dispatcher._STOP
+    assert backend.published == [("0", "key", "events")]
+    assert events_dispatcher.stats["dropped"] == 0
+
+
+def test_dispatch_after_stop_does_not_restart_the_worker():
+    backend = FakeBackend()
+    events_dispatcher = _make_dispatcher(backend)
+
+    events_dispatcher.dispatch("0", routing_key="key")
+    events_dispatcher.stop()
+    events_dispatcher.dispatch("1", routing_key="key")
+
+    assert events_dispatcher._thread is None
+    assert [message for message, _, _ in backend.published] == ["0", "1"]
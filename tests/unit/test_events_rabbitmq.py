@@ -0,0 +1,124 @@
+# Copyright (C) 2014 Andrey Antukh <niwi@niwi.be>
+# Copyright (C) 2014 Jesús Espino <jespinog@gmail.com>
+# Copyright (C) 2014 David Barragán <bameda@dbarragan.com>
+# Copyright (C) 2014 Anler Hernández <hello@anler.me>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from taiga.events.backends import rabbitmq
+
+
+class FakeBroker:
+    def __init__(self):
+        self.connections = 0
+        self.declared = []
+        self.published = []
+        self.fail_next = False
+        self.down = False
+
+
+class FakeChannel:
+    def __init__(self, broker):
+        self.broker = broker
+
+    def exchange_declare(self, exchange, type, auto_delete):
+        self.broker.declared.append(exchange)
+
+    def basic_publish(self, message, routing_key, exchange):
+        if self.broker.fail_next:
+            self.broker.fail_next = False
+            raise IOError("Connection lost")
+        self.broker.published.append((message.body, routing_key, exchange))
+
+
+class FakeConnection:
+    def __init__(self, broker):
+        if broker.down:
+            raise IOError("Connection refused")
+
+        self.broker = broker
+        self.closed = False
+        broker.connections += 1
+
+    def channel(self):
+        return FakeChannel(self.broker)
+
+    def close(self):
+        self.closed = True
+
+
+def _make_backend(broker, **kwargs):
+    return rabbitmq.EventsPushBackend("//guest:guest@localhost/", retry_backoff=0,
+                                      connection_factory=lambda: FakeConnection(broker), **kwargs)
+
+
+def test_connections_are_reused():
+    broker = FakeBroker()
+    backend = _make_backend(broker)
+
+    backend.emit_event("foo", routing_key="a", channel="events")
+    backend.emit_event("bar", routing_key="b", channel="events")
+
+    assert broker.connections == 1
+    assert broker.declared == ["events"]
+    assert broker.published == [("foo", "a", "events"), ("bar", "b", "events")]
+
+
+def test_emit_events_in_batch():
+    broker = FakeBroker()
+    backend = _make_backend(broker)
+
+    backend.emit_events([("foo", "a", "events"), ("bar", "b", "other")])
+
+    assert broker.connections == 1
+    assert broker.declared == ["events", "other"]
+    assert len(broker.published) == 2
+
+
+def test_reconnect_on_error():
+    broker = FakeBroker()
+    backend = _make_backend(broker)
+
+    backend.emit_event("foo", routing_key="a", channel="events")
+    broker.fail_next = True
+    backend.emit_event("bar", routing_key="b", channel="events")
+
+    assert broker.connections == 2
+    assert broker.published == [("foo", "a", "events"), ("bar", "b", "events")]
+
+
+def test_events_are_dropped_after_max_retries():
+    broker = FakeBroker()
+    backend = _make_backend(broker, max_retries=0)
+
+    broker.fail_next = True
+    backend.emit_event("foo", routing_key="a", channel="events")
+
+    assert broker.published == []
+
+
+def test_requests_do_not_wait_for_the_broker(monkeypatch):
+    broker = FakeBroker()
+    broker.down = True
+    backend = _make_backend(broker, max_retries=3)
+    backend.retry_backoff = 10
+
+    sleeps = []
+    monkeypatch.setattr(rabbitmq.time, "sleep", sleeps.append)
+
+    backend.emit_event("foo", routing_key="a", channel="events")
+    assert sleeps == []
+
+    backend.emit_events([("foo", "a", "events")], retry=True)
+    assert sleeps == [10, 20, 40]
+    assert broker.published == []
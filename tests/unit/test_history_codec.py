@@ -0,0 +1,40 @@
+# Copyright (C) 2014 Andrey Antukh <niwi@niwi.be>
+# Copyright (C) 2014 Jesús Espino <jespinog@gmail.com>
+# Copyright (C) 2014 David Barragán <bameda@dbarragan.com>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from taiga.projects.history import codec
+
+
+def test_encode_small_payloads_as_is():
+    diff = {"subject": ["foo", "bar"], "status": [1, 2]}
+    assert codec.encode(diff) == diff
+    assert codec.decode(diff) == diff
+
+
+def test_encode_text_changes_as_deltas():
+    old = "lorem ipsum dolor sit amet " * 20
+    new = old + "consectetur"
+    diff = {"description": [old, new], "status": [1, 2]}
+
+    encoded = codec.encode(diff, min_size=100)
+    assert codec.decode(encoded) == diff
+
+
+def test_encode_compress_large_payloads():
+    snapshot = {"description": "lorem ipsum dolor sit amet " * 100, "watchers": [1, 2]}
+
+    encoded = codec.encode(snapshot)
+    assert list(encoded.keys()) == [codec.ZLIB_MARKER]
+    assert codec.decode(encoded) == snapshot
@@ -0,0 +1,51 @@
+# Copyright (C) 2014 Andrey Antukh <niwi@niwi.be>
+# Copyright (C) 2014 Jesús Espino <jespinog@gmail.com>
+# Copyright (C) 2014 David Barragán <bameda@dbarragan.com>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from unittest import mock
+
+from taiga.projects.history import resolvers
+
+
+def test_resolve_without_scope_always_fetch():
+    fetch = mock.Mock(return_value=[("1", "foo")])
+
+    assert resolvers._resolve(("test", "name"), [1, None], fetch) == {"1": "foo"}
+    assert resolvers._resolve(("test", "name"), [1], fetch) == {"1": "foo"}
+    assert fetch.call_count == 2
+
+
+def test_resolve_within_scope_reuse_lookups():
+    fetch = mock.Mock(return_value=[("1", "foo")])
+
+    with resolvers.values_resolution_scope():
+        assert resolvers._resolve(("test", "name"), [1, 2], fetch) == {"1": "foo"}
+        assert resolvers._resolve(("test", "name"), ["1"], fetch) == {"1": "foo"}
+
+    assert fetch.call_count == 1
+    assert not resolvers.is_scope_active()
+
+
+def test_resolve_within_scope_does_not_cache_misses():
+    fetch = mock.Mock(return_value=[])
+
+    with resolvers.values_resolution_scope():
+        assert resolvers._resolve(("test", "name"), [2], fetch) == {}
+
+        fetch.return_value = [("2", "bar")]
+        assert resolvers._resolve(("test", "name"), [2], fetch) == {"2": "bar"}
+        assert resolvers._resolve(("test", "name"), [2], fetch) == {"2": "bar"}
+
+    assert fetch.call_count == 2
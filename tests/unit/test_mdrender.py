@@ -18,7 +18,8 @@
 from unittest.mock import patch, MagicMock
 
 from taiga.mdrender.extensions import emojify
-from taiga.mdrender.service import render, cache_by_sha, get_diff_of_htmls, render_and_extract
+from taiga.mdrender.service import (render, cache_by_sha, get_diff_of_htmls, render_and_extract,
+                                    extract_mentions_from_html)
 
 from datetime import datetime
 
@@ -204,3 +205,14 @@ def test_render_and_extract_references():
         instance.content_object.subject = "test"
         (_, extracted) = render_and_extract(dummy_project, "**#1**")
         assert extracted['references'] == [instance.content_object]
+
+
+def test_extract_mentions_from_html():
+    with patch("taiga.mdrender.extensions.mentions.User") as mock:
+        mock.objects.get.return_value.get_full_name.return_value = "Foo Bar"
+        html = render(dummy_project, "Hi @foo and @bar-baz, bye @foo")
+
+    assert extract_mentions_from_html(html) == ["foo", "bar-baz"]
+    assert extract_mentions_from_html(None) == []
+    assert extract_mentions_from_html("<a title='x' href='/profile/baz' class='mention'>@baz</a>"
+                                      '<a href="/profile/qux">@qux</a>') == ["baz"]
@@ -28,30 +28,34 @@ import pytest
 
 
 def test_push_to_timeline_many_objects():
-    with patch("taiga.timeline.service._add_to_object_timeline") as mock:
+    with patch("taiga.timeline.service._add_to_objects_timeline") as mock:
         users = [User(), User(), User()]
         project = Project()
         service.push_to_timeline(users, project, "test")
-        assert mock.call_count == 3
+        assert mock.call_count == 1
         assert mock.mock_calls == [
-            call(users[0], project, "test", "default", {}),
-            call(users[1], project, "test", "default", {}),
-            call(users[2], project, "test", "default", {}),
+            call(users, project, "test", "default", {}),
         ]
         with pytest.raises(Exception):
             service.push_to_timeline(None, project, "test")
 
-def test_add_to_objects_timeline():
-    with patch("taiga.timeline.service._add_to_object_timeline") as mock:
-        users = [User(), User(), User()]
+def test_add_to_objects_timeline(monkeypatch):
+    impl = MagicMock(return_value={"test": "data"})
+    monkeypatch.setitem(service._timeline_impl_map, "projects.project.test", impl)
+
+    with patch("taiga.timeline.service._get_content_type_for_model") as ct_mock, \
+            patch.object(Timeline.objects, "bulk_create") as bulk_create_mock:
+        users = [User(id=1), User(id=2), User(id=3)]
         project = Project()
         service._add_to_objects_timeline(users, project, "test")
-        assert mock.call_count == 3
-        assert mock.mock_calls == [
-            call(users[0], project, "test", "default", {}),
-            call(users[1], project, "test", "default", {}),
-            call(users[2], project, "test", "default", {}),
-        ]
+
+        assert impl.call_count == 1
+        assert bulk_create_mock.call_count == 1
+
+        entries = bulk_create_mock.call_args[0][0]
+        assert [entry.object_id for entry in entries] == [1, 2, 3]
+        assert all(entry.data == {"test": "data"} for entry in entries)
+
         with pytest.raises(Exception):
             service.push_to_timeline(None, project, "test")
 